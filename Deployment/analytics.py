@@ -0,0 +1,136 @@
+import math
+from collections import defaultdict
+
+from pymongo import UpdateOne
+
+from drift_monitor import BIN_EDGES
+from story_cache import normalize_field
+
+# Daily rollups for the Power BI dashboard, kept up to date as the write-behind
+# buffer stores feedback and drift documents. Each rollup document covers one
+# (day, genre, language) and only holds counters, so a dashboard refresh reads
+# a few kilobytes instead of the whole feedback history:
+#   daily_ratings  rated stories, rating sum and count per star
+#   daily_latency  latency histogram (bins "lt_<edge>" / "ge_<edge>"), sums
+#   daily_drift    per-story drift warnings and aggregated drift events per metric
+# prompt_variant_stats holds requests, FRE band checks and passes per (day,
+# prompt variant, age band, language) for the offline A/B evaluation in prompt_ab.py.
+LATENCY_EDGES = BIN_EDGES["latency"]
+ROLLUP_COLLECTIONS = ("daily_ratings", "daily_latency", "daily_drift", "prompt_variant_stats")
+ROLLUP_FIELDS = {
+    "daily_ratings": ("day", "genre", "language"),
+    "daily_latency": ("day", "genre", "language"),
+    "daily_drift": ("day", "genre", "language"),
+    "prompt_variant_stats": ("day", "variant", "age_range", "language"),
+}
+
+
+def latency_bin(value):
+    for edge in LATENCY_EDGES:
+        if value < edge:
+            return f"lt_{edge}"
+    return f"ge_{LATENCY_EDGES[-1]}"
+
+
+def bin_percentile(bins, q):
+    # Linear interpolation inside the histogram bin that holds quantile q
+    total = sum(bins.values())
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    low = 0
+    for edge in LATENCY_EDGES:
+        count = bins.get(f"lt_{edge}", 0)
+        if count and seen + count >= target:
+            return round(low + (edge - low) * (target - seen) / count, 2)
+        seen += count
+        low = edge
+    return LATENCY_EDGES[-1]
+
+
+def as_number(value):
+    # The frontend sends latency back as the "12.34 sec" string from /generate_story
+    if isinstance(value, str) and value.split():
+        value = value.split()[0]
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    # NaN and infinity would poison the $inc sums (and int() raises on them)
+    return value if math.isfinite(value) else None
+
+
+def rollup_key(document):
+    day = str(document.get("datetime") or "")[:10]
+    return f"{day}|{normalize_field(document.get('genre')) or 'none'}|{normalize_field(document.get('language')) or 'none'}"
+
+
+class Rollups:
+    def __init__(self, db):
+        self.collections = {name: db[name] for name in ROLLUP_COLLECTIONS}
+
+    def on_write(self, name, documents):
+        # Called by the write-behind buffer after a batch was inserted
+        deltas = {rollup: defaultdict(lambda: defaultdict(int)) for rollup in ROLLUP_COLLECTIONS}
+        for document in documents:
+            key = rollup_key(document)
+            if name == "feedback":
+                ratings = deltas["daily_ratings"][key]
+                ratings["stories"] += 1
+                rating = as_number(document.get("rating"))
+                # Out-of-range ratings are left out of this document's counters only
+                if rating is not None and 1 <= rating <= 5:
+                    ratings["rated"] += 1
+                    ratings["rating_sum"] += rating
+                    ratings[f"stars.{int(rating)}"] += 1
+                latency = as_number(document.get("latency"))
+                if latency is not None:
+                    latencies = deltas["daily_latency"][key]
+                    latencies["count"] += 1
+                    latencies["latency_sum"] += latency
+                    latencies[f"bins.{latency_bin(latency)}"] += 1
+            elif name == "Drift_warnings":
+                deltas["daily_drift"][key]["warnings"] += 1
+            elif name == "Drift_events":
+                drift = deltas["daily_drift"][key]
+                drift["events"] += 1
+                drift[f"events_by_metric.{document.get('metric')}"] += 1
+            elif name == "prompt_outcomes":
+                day = str(document.get("datetime") or "")[:10]
+                stats = deltas["prompt_variant_stats"][
+                    f"{day}|{document.get('variant')}|{document.get('age_range')}|{normalize_field(document.get('language')) or 'none'}"
+                ]
+                stats["requests"] += 1
+                stats["checks"] += document.get("checks", 0)
+                stats["passes"] += document.get("passes", 0)
+                stats["prompt_tokens"] += document.get("prompt_tokens", 0)
+        for rollup, changes in deltas.items():
+            if changes:
+                self.collections[rollup].bulk_write(
+                    [self._update(rollup, key, inc) for key, inc in changes.items()], ordered=False
+                )
+
+    def _update(self, rollup, key, inc):
+        fields = dict(zip(ROLLUP_FIELDS[rollup], key.split("|", len(ROLLUP_FIELDS[rollup]) - 1)))
+        return UpdateOne({"_id": key}, {"$inc": dict(inc), "$setOnInsert": fields}, upsert=True)
+
+    def daily(self, rollup, since=None):
+        query = {"day": {"$gte": since}} if since else {}
+        return list(self.collections[rollup].find(query).sort("_id", 1))
+
+    def latency_summary(self, since=None):
+        rows = []
+        for doc in self.daily("daily_latency", since):
+            bins = doc.get("bins", {})
+            rows.append({
+                "day": doc["day"],
+                "genre": doc["genre"],
+                "language": doc["language"],
+                "count": doc.get("count", 0),
+                "avg": round(doc["latency_sum"] / doc["count"], 2) if doc.get("count") else None,
+                "p50": bin_percentile(bins, 0.5),
+                "p95": bin_percentile(bins, 0.95),
+                "p99": bin_percentile(bins, 0.99),
+            })
+        return rows
@@ -1,50 +1,141 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify, Response, stream_with_context, send_file, abort, g
 from flask_cors import CORS
-import google.generativeai as genai
-import re
 import time
+import atexit
+import os
 import config
 from pymongo import MongoClient
-import textstat
+import readability
 from datetime import datetime
+from story_stream import StoryStreamParser, iter_story_events, to_ndjson
+from scheduler import GenerationScheduler, Overloaded
+from speculation import first_acceptable, speculation_stats
+from prompts import get_flesch_band, parse_story, label_map, DEFAULT_LABELS
+from prompt_variants import VariantSelector
+from narration import build_narration, SPEECH_LANGS
+from tts import AudioCache, ENGINES
+from batch import BatchRunner
+from story_cache import StoryCache, MemoryCacheBackend, MongoCacheBackend
+from write_buffer import WriteBehindBuffer
+from user_store import UserStore
+from drift_monitor import DriftMonitor
+from analytics import Rollups
+import tracing
+from tracing import start_trace, span
+from lazy import ProcessLocal
+
+bp = Blueprint("story", __name__)
+
+# MongoDB clients, the Gemini model and everything holding a connection or a
+# background thread are built on first use in each process (see lazy.py), so
+# importing the app is cheap and every gunicorn worker gets its own.
+def build_client():
+    return MongoClient(
+        config.MONGO_URI,
+        maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+        serverSelectionTimeoutMS=config.MONGO_TIMEOUT_MS,
+        connect=False
+    )
+
+client = ProcessLocal(build_client)
+db = ProcessLocal(lambda: client[config.MONGO_DB], "db")
+
+# Daily dashboard rollups, updated from each batch the write buffer stores
+rollups = ProcessLocal(lambda: Rollups(db), "rollups")
+
+def build_write_buffer():
+    # Feedback, drift warnings and login logs are written in batches off the request path
+    return WriteBehindBuffer(
+        {
+            "feedback": db["feedback"],
+            "Drift_warnings": db["Drift_warnings"],
+            "login_logs": db["login_logs"],
+            "Drift_events": db["Drift_events"],
+            "prompt_outcomes": db["prompt_outcomes"],
+        },
+        batch_size=config.WRITE_BUFFER_BATCH_SIZE,
+        flush_interval=config.WRITE_BUFFER_FLUSH_INTERVAL,
+        max_pending=config.WRITE_BUFFER_MAX_PENDING,
+        policy=config.WRITE_BUFFER_FULL_POLICY,
+        on_write=rollups.on_write,
+        max_retries=config.WRITE_BUFFER_MAX_RETRIES,
+        retry_backoff=config.WRITE_BUFFER_RETRY_BACKOFF
+    )
+
+write_buffer = ProcessLocal(build_write_buffer)
+
+def build_user_store():
+    store = UserStore(
+        db["users"],
+        cache_ttl=config.AUTH_CACHE_TTL,
+        cache_size=config.AUTH_CACHE_SIZE,
+        token_ttl=config.SESSION_TOKEN_TTL,
+        iterations=config.PASSWORD_HASH_ITERATIONS
+    )
+    store.ensure_indexes()
+    return store
+
+user_store = ProcessLocal(build_user_store)
+
+# Rolling per-segment drift statistics; aggregated events go to Drift_events
+drift_monitor = ProcessLocal(lambda: DriftMonitor(
+    window=config.DRIFT_WINDOW,
+    min_samples=config.DRIFT_MIN_SAMPLES,
+    evaluate_every=config.DRIFT_EVALUATE_EVERY,
+    psi_threshold=config.DRIFT_PSI_THRESHOLD,
+    cooldown=config.DRIFT_EVENT_COOLDOWN,
+    baseline_collection=db["drift_baselines"],
+    emit=lambda event: write_buffer.put("Drift_events", event)
+), "drift_monitor")
+
+def build_story_cache():
+    if config.STORY_CACHE_BACKEND == "mongo":
+        backend = MongoCacheBackend(db["story_cache"], max_keys=config.STORY_CACHE_MAX_KEYS)
+    elif config.STORY_CACHE_BACKEND == "memory":
+        backend = MemoryCacheBackend(max_keys=config.STORY_CACHE_MAX_KEYS)
+    else:
+        return None
+    return StoryCache(backend, variants=config.STORY_CACHE_VARIANTS, ttl=config.STORY_CACHE_TTL)
 
-app = Flask(__name__)
-CORS(app)
-
-# MongoDB setup
-client = MongoClient("mongodb://localhost:27017/")
-db = client["story_app"]
-feedback_collection = db["feedback"]
-users_collection = db["users"]
-psi_warning_collection = db["Drift_warnings"]  # Collection for storing PSI warnings
-login_logs_collection = db["login_logs"]  # Add this line for the new collection
+story_cache = ProcessLocal(build_story_cache)
 
 # Gemini API setup
-api_key = config.API_KEY
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel("gemini-1.5-flash")
-
-# Flesch score mapping
-flesch_map = {
-    "3-8": (80, 100),
-    "9-15": (60, 80),
-    "16-19": (50, 60),
-    "20+": (30, 50),
-}
-
-def get_flesch_band(age_range):
-    score_min, score_max = 30, 100  # default
-    for k, (minv, maxv) in flesch_map.items():
-        if "-" in k and "-" in age_range:
-            k_start, k_end = map(int, k.split("-"))
-            a_start, a_end = map(int, age_range.split("-"))
-            if a_start >= k_start and a_end <= k_end:
-                score_min, score_max = minv, maxv
-                break
-        elif "+" in k and "+" in age_range:
-            score_min, score_max = flesch_map[k]
-            break
-    return score_min, score_max
+def build_model():
+    # Imported here: the Gemini SDK takes most of the app's import time
+    import google.generativeai as genai
+    genai.configure(api_key=config.API_KEY)
+    return genai.GenerativeModel(config.GEMINI_MODEL)
+
+model = ProcessLocal(build_model)
+
+# Rendered narration audio, cached on disk next to the app
+audio_cache = ProcessLocal(lambda: AudioCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), config.TTS_CACHE_DIR),
+    ENGINES[config.TTS_ENGINE](),
+    max_bytes=config.TTS_CACHE_MAX_BYTES
+), "audio_cache")
+
+# Prompt variant per (age band, language), as chosen offline by prompt_ab.py
+prompt_selector = VariantSelector(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), config.PROMPT_VARIANTS_FILE),
+    default=config.PROMPT_DEFAULT_VARIANT,
+    explore=config.PROMPT_EXPLORE_SHARE
+)
+
+# Bounded, per-user fair queue in front of the Gemini calls
+scheduler = ProcessLocal(lambda: GenerationScheduler(
+    max_in_flight=config.MAX_IN_FLIGHT_GENERATIONS,
+    max_queued=config.MAX_QUEUED_GENERATIONS,
+    prefix_limits={"batch:": config.BATCH_MAX_IN_FLIGHT}
+), "scheduler")
+
+def close_services():
+    # Flush pending writes on shutdown, if this process ever started the buffer
+    if isinstance(write_buffer, ProcessLocal) and not write_buffer.built():
+        return
+    write_buffer.close()
+
+atexit.register(close_services)
 
 def calculate_psi(speed, flesch_score, story_length):
     # Example weights, adjust as needed
@@ -54,230 +145,83 @@ def calculate_psi(speed, flesch_score, story_length):
     psi = (speed_weight * speed) + (flesch_weight * flesch_score) + (length_weight * (story_length / 1000))
     return round(psi, 2)
 
-@app.route("/generate_story", methods=["POST"])
-def generate_story():
-    data = request.json
+GENERATION_CONFIG = {
+    "temperature": 0.8,
+    "top_p": 1,
+    "top_k": 40
+}
+MAX_ATTEMPTS = 3
+
+def extract_story_body(full_text):
+    return parse_story(full_text)["story_body"]
+
+def within_flesch_band(full_text, score_min, score_max):
+    with span("band_check"):
+        story_body = extract_story_body(full_text)
+        if story_body is None:
+            return False
+        flesch_score_val = readability.flesch_reading_ease(story_body)
+        passed = score_min <= flesch_score_val <= score_max
+        trace = tracing.current_trace()
+        if trace:
+            trace.record_band_check(passed)
+        return passed
+
+def finalize_story(data, full_text, latency):
     age_range = data.get("age_range")
-    genre = data.get("genre")
-    theme = data.get("theme")
-    characters = data.get("characters")
     language = data.get("language", "")
-
     score_min, score_max = get_flesch_band(age_range)
-    flesch_score = f"{score_min}–{score_max}"
-
-    prompt = f"""
-    Write an imaginative and age-appropriate story for Indian children aged {age_range}.
-
-    Requirements:
-    - Genre: {genre}
-    - Main Characters: {characters}
-    - Theme: {theme}
-    - Story Length: Maximum 350 words.
-    - Use simple, clear English vocabulary and sentence structure that is suitable for children aged {age_range}.
-    - The story MUST be written so that its Flesch Reading Ease (FRE) score is between {flesch_score}. 
-    - The Flesch score requirement applies ONLY to the English story.
-    - DO NOT include any translation, non-English words, or translation labels in the English story section.
-    - Avoid complex words and long sentences for younger ages; use more advanced language for older ages.
-    - Include a catchy, relevant title at the beginning.
-    - End with a moral in the format: Moral: [your moral]
-    - **Do NOT add any label like 'English Story:' or similar. Only use 'Title:', the story text, and 'Moral:' as shown below.**
-
-    Format:
-    Title: [Your title]
-    [Story text]
-    Moral: [your moral]
-    """
-
-    if age_range in ["3-5", "3-8"]:
-        prompt += (
-            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 80 and 100."
-            "\n- Use normal words and keep medium sentences (6-9 words each)."
-            "\n- Avoid any very easy or very complex vocabulary."
-            "\n- Imagine you are writing for a 3–8 year old who is just learning to read."
-            "\n- If the story is  very easy or more difficult, REWRITE it until it fits the FRE score range."
-            "\n- Do NOT write a story that is outside this FRE score range."
-            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
-        )
-    elif age_range in ["9-15"]:
-        prompt += (
-            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 60 and 80."
-            "\n- The FRE score must NEVER be above 80 or below 60 for this age group."
-            "\n- Use simple and clear words."
-            "\n- Keep sentences short (10–14 words) and easy to understand."
-            "\n- Avoid difficult vocabulary and long sentences."
-            "\n- Do not use advanced or academic words."
-            "\n- Imagine you are writing for a school student aged 9 to 15."
-            "\n- If the story is too easy or too hard, or if the FRE score is outside 60–80, REWRITE it until it fits the FRE score range."
-            "\n- You absolutely MUST NOT write a story with a Flesch score above 80 or below 60."
-            "\n- Do NOT write a story that is outside this FRE score range."
-            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
-            "\n- EVEN WHEN TRANSLATING TO ANOTHER LANGUAGE, NEVER GO OUTSIDE THE FRE SCORE RANGE OF 60–80."
-            "\n- Repeat: The story (and any translation) MUST have a Flesch Reading Ease (FRE) score between 60 and 80."
-        )
-    elif age_range in ["16-19"]:
-        prompt += (
-            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 50 and 60."
-            "\n- Use clear language with some moderately advanced vocabulary."
-            "\n- Keep most sentences between 10 and 16 words."
-            "\n- Mix simple and moderately complex sentences, but avoid very long or academic sentences."
-            "\n- Do not use too many advanced words."
-            "\n- Write as you would for a high school student aged 16 to 19."
-            "\n- If the story is too easy or too hard, REWRITE it until it fits the FRE score range."
-            "\n- Do NOT write a story that is outside this FRE score range."
-            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
-        )
-    elif age_range in ["20+"]:
-        prompt += (
-            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 30 and 50."
-            "\n- Aim for a FRE score between 40 and 45. Do NOT write a story with a FRE score below 35 or above 45."
-            "\n- Use advanced vocabulary, medium sentences, and  complex sentence structures."
-            "\n- Do not simplify the language. Write as you would for college students or adults."
-            "\n- If the story is very too easy (FRE > 50) or very too hard (FRE < 30), REWRITE it until it fits the FRE score range."
-            "\n- Do NOT write a story that is outside this FRE score range."
-            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
-            "\n- If you do not follow the FRE rule, your answer will be rejected and regenerated."
-        )
-
-    if language and language.lower() != "none":
-        lang_key = language.lower()
-        labels = label_map.get(lang_key, {
-            "title": "Title",
-            "story": "Story",
-            "moral": "Moral"
-        })
-        prompt += f"""
-
-After you have finished the English story above, translate ONLY the English story and its moral into {language} for Indian children.
-
-**Translation Instructions:**
-- Do NOT translate word-for-word. Use natural, fluent, and child-friendly {language} as used in everyday conversation.
-- Ensure the translated story is easy for children in the target age group to understand.
-- Use age-appropriate vocabulary and grammar for {language}.
-- Do NOT include any English words unless they are proper nouns.
-- Write ONLY the translated version, using these labels (translated in {language}):
-    - {labels['title']}: [Translated title]
-    - {labels['story']}: [Translated story]
-    - {labels['moral']}: [Translated moral]
-- DO NOT repeat the English story or moral.
-- DO NOT include any English text in this section (except proper nouns).
-- Structure:
-    {labels['title']}: [Translated title]
-    {labels['story']}: [Translated story]
-    {labels['moral']}: [Translated moral]
-- Even when translating to {language}, ensure the story would have a Flesch Reading Ease (FRE) score in the same range as required for English. Do NOT make the translation easier or harder than the English version. Do NOT go outside the FRE range for the selected age group, even in translation.
-"""
-        # Add language-specific note if available
-        if lang_key in language_notes:
-            prompt += f"\n{language_notes[lang_key]}"
-
-    try:
-        start = time.time()
-        MAX_ATTEMPTS = 3
-        for attempt in range(MAX_ATTEMPTS):
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.8,
-                    "top_p": 1,
-                    "top_k": 40
-                }
-            )
-            full_text = response.text.strip()
-            english_section = re.search(r"Title:.*?(?:\n|\r\n)(.*?)(?:\n|\r\n)Moral:\s*(.*)", full_text, re.DOTALL)
-            if english_section:
-                story_body = english_section.group(1).strip()
-                flesch_score_val = round(textstat.flesch_reading_ease(story_body), 2)
-                if score_min <= flesch_score_val <= score_max:
-                    break
-            if attempt == MAX_ATTEMPTS - 1:
-                warning = f"Failed to generate a story within FRE range ({score_min}-{score_max}) after {MAX_ATTEMPTS} attempts."
-
-        latency = round(time.time() - start, 2)
-        latency_with_units = f"{latency} sec"
-        full_text = response.text.strip()
-
-        match = re.search(r"Title:\s*(.*)", full_text)
-        if match:
-            title = match.group(1).strip()
-            story = full_text.replace(match.group(0), "").strip()
-        else:
-            title = full_text.split("\n")[0].strip()
-            story = "\n".join(full_text.split("\n")[1:]).strip()
-
-        # Extract moral if present
-        moral_match = re.search(r"Moral:\s*(.*)", story)
-        moral = moral_match.group(1).strip() if moral_match else ""
-
-        
-        # Extract only the English story (from Title: to Moral:)
-        english_section = re.search(r"Title:.*?(?:\n|\r\n)(.*?)(?:\n|\r\n)Moral:\s*(.*)", full_text, re.DOTALL)
-        if english_section:
-            story_body = english_section.group(1).strip()
-            moral = english_section.group(2).strip()
-            story_text = f"{story_body}\nMoral: {moral}"
-        else:
-            # fallback to previous logic
-            story_text = re.sub(r"Title:.*\n?", "", full_text)
-            story_text = re.sub(r"Moral:.*", "", story_text)
-
-        flesch_score_val = round(textstat.flesch_reading_ease(story_body), 2) if english_section else 0
-
-        # Translation handling
-        translated_title = ""
-        translated_story = ""
-        translated_moral = ""
-
-        if language and language.lower() != "none":
-            lang_key = language.lower()
-            labels = label_map.get(lang_key, {
-                "title": "Title",
-                "story": "Story",
-                "moral": "Moral"
-            })
-            # Try to extract the translation section
-            translation_match = re.search(rf"Translation in {language}:(.*)", story, re.DOTALL | re.IGNORECASE)
-            if translation_match:
-                translation_text = translation_match.group(1).strip()
-                # Extract translated title
-                title_match = re.search(rf"{labels['title']}[:：]?\s*(.*)", translation_text)
-                if title_match:
-                    translated_title = title_match.group(1).strip()
-                # Extract translated story
-                story_match = re.search(rf"{labels['story']}[:：]?\s*([\s\S]*?)(?:\n{labels['moral']}[:：]?|$)", translation_text)
-                if story_match:
-                    translated_story = story_match.group(1).strip()
-                # Extract translated moral
-                moral_match_trans = re.search(rf"{labels['moral']}[:：]?\s*(.*)", translation_text)
-                if moral_match_trans:
-                    translated_moral = moral_match_trans.group(1).strip()
-
-        speed = float(latency)
-        
-        # Always use the English story for length calculation
-        story_length = len(story_body) if 'story_body' in locals() else len(story)
-
-        psi = calculate_psi(speed, flesch_score_val, story_length)
-
-        # Set your thresholds
-        SPEED_THRESHOLD = 15      # seconds, example
-        LENGTH_MIN = 300  # Minimum story length
-        LENGTH_MAX = 1500   # Maximum story length
-
-        drift_reasons = []
-        if speed > SPEED_THRESHOLD:
-            drift_reasons.append(f"Speed drift (speed={speed}s > {SPEED_THRESHOLD}s)")
-        # Use age-specific Flesch min/max for drift detection
-        if flesch_score_val < score_min or flesch_score_val > score_max:
-            drift_reasons.append(f"Flesch drift (score={flesch_score_val} not in {score_min}-{score_max})")
-        if story_length < LENGTH_MIN or story_length > LENGTH_MAX:
-            drift_reasons.append(f"Length drift (length={story_length} not in {LENGTH_MIN}-{LENGTH_MAX})")
-        if psi > 50:
-            drift_reasons.append(f"Performance & Suitability Index drift (psi={psi} > 50)")
-
-        warning = "; ".join(drift_reasons) if drift_reasons else ""
-
-        if warning:
+    latency_with_units = f"{latency} sec"
+
+    with span("parse"):
+        parsed = parse_story(full_text, language)
+    title = parsed["title"]
+    story = parsed["story"]
+    moral = parsed["moral"]
+    story_body = parsed["story_body"]
+    translated_title = parsed["translated_title"]
+    translated_story = parsed["translated_story"]
+    translated_moral = parsed["translated_moral"]
+
+    with span("fre_score"):
+        flesch_score_val = readability.flesch_reading_ease(story_body) if story_body is not None else 0
+
+        # Translations are scored with the script-aware scorer for their language
+        translated_flesch_score = readability.flesch_reading_ease(translated_story, language) if translated_story else None
+
+    speed = float(latency)
+
+    # Always use the English story for length calculation
+    story_length = len(story_body) if story_body is not None else len(story)
+
+    psi = calculate_psi(speed, flesch_score_val, story_length)
+
+    # Set your thresholds
+    SPEED_THRESHOLD = 15      # seconds, example
+    LENGTH_MIN = 300  # Minimum story length
+    LENGTH_MAX = 1500   # Maximum story length
+
+    drift_reasons = []
+    if speed > SPEED_THRESHOLD:
+        drift_reasons.append(f"Speed drift (speed={speed}s > {SPEED_THRESHOLD}s)")
+    # Use age-specific Flesch min/max for drift detection
+    if flesch_score_val < score_min or flesch_score_val > score_max:
+        drift_reasons.append(f"Flesch drift (score={flesch_score_val} not in {score_min}-{score_max})")
+    if story_length < LENGTH_MIN or story_length > LENGTH_MAX:
+        drift_reasons.append(f"Length drift (length={story_length} not in {LENGTH_MIN}-{LENGTH_MAX})")
+    if psi > 50:
+        drift_reasons.append(f"Performance & Suitability Index drift (psi={psi} > 50)")
+
+    warning = "; ".join(drift_reasons) if drift_reasons else ""
+
+    drift_values = {"latency": speed, "flesch_score": flesch_score_val, "story_length": story_length}
+    if translated_flesch_score is not None:
+        drift_values["translated_flesch_score"] = translated_flesch_score
+    with span("drift"):
+        drift_monitor.update((age_range, language, data.get("genre")), **drift_values)
+
+    if warning and config.DRIFT_LOG_PER_REQUEST:
+        with span("mongo_write"):
             log_psi_warning(
                 data,
                 psi,
@@ -289,26 +233,369 @@ After you have finished the English story above, translate ONLY the English stor
                 title       # generated title
             )
 
-        return jsonify({
-            "title": title,
-            "story": story,
-            "moral": moral,
-            "translated_title": translated_title,
-            "translated_story": translated_story,
-            "translated_moral": translated_moral,
-            "latency": latency_with_units,
-            "flesch_score": flesch_score_val,
-            "narration_text": f"Title: {title}. {story}",
-            "psi": psi,
-            "warning": warning
+    return {
+        "title": title,
+        "story": story,
+        "moral": moral,
+        "translated_title": translated_title,
+        "translated_story": translated_story,
+        "translated_moral": translated_moral,
+        "latency": latency_with_units,
+        "flesch_score": flesch_score_val,
+        "translated_flesch_score": translated_flesch_score,
+        "narration_text": f"Title: {title}. {story}",
+        "narration": build_narration(
+            title,
+            # Unparsed output still carries the moral and translation after "Moral:"
+            story_body if story_body is not None else story.split("\nMoral:")[0].strip(),
+            moral,
+            language,
+            translated_title,
+            translated_story,
+            translated_moral,
+            labels=label_map.get(language.lower() if language else "", DEFAULT_LABELS)
+        ),
+        "psi": psi,
+        "warning": warning
+    }
+
+def request_user(data):
+    return data.get("username") or request.remote_addr
+
+def overloaded_response(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+def request_prompt(data):
+    variant, prompt = prompt_selector.build_prompt(
+        data.get("age_range"),
+        data.get("genre"),
+        data.get("theme"),
+        data.get("characters"),
+        data.get("language", "")
+    )
+    trace = tracing.current_trace()
+    if trace:
+        trace.variant = variant
+    return prompt
+
+def record_prompt_outcome(trace):
+    # Band checks and passes per prompt variant, rolled up into prompt_variant_stats for prompt_ab.py
+    if trace.variant and trace.band_checks:
+        write_buffer.put("prompt_outcomes", {
+            "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "variant": trace.variant,
+            "age_range": trace.labels[1],
+            "language": trace.labels[2],
+            "checks": trace.band_checks,
+            "passes": trace.band_passes,
+            "prompt_tokens": trace.prompt_tokens,
         })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
-@app.route("/submit_feedback", methods=["POST"])
+batch_runner = ProcessLocal(lambda: BatchRunner(
+    db["batch_jobs"],
+    generate=lambda job_id, prompt: scheduler.run(
+        f"batch:{job_id}",
+        model.generate_content,
+        prompt,
+        generation_config=GENERATION_CONFIG
+    ).text.strip(),
+    finalize=finalize_story,
+    within_band=within_flesch_band,
+    get_band=get_flesch_band,
+    build_prompt=request_prompt,
+    pack_size=config.BATCH_PACK_SIZE,
+    max_attempts=MAX_ATTEMPTS,
+    per_minute=config.BATCH_CALLS_PER_MINUTE,
+    workers=config.BATCH_WORKERS
+), "batch_runner")
+
+@bp.route("/generate_story", methods=["POST"])
+def generate_story():
+    data = request.json
+    with start_trace("generate_story", data.get("age_range"), data.get("language"), record_prompt_outcome) as trace:
+        g.trace = trace
+        with span("prompt_build"):
+            score_min, score_max = get_flesch_band(data.get("age_range"))
+            prompt = request_prompt(data)
+
+        try:
+            with span("cache_lookup"):
+                cached = story_cache.lookup(data) if story_cache else None
+            if cached:
+                trace.outcome = "cache_hit"
+                return jsonify(cached)
+
+            start = time.time()
+            user = request_user(data)
+            response = first_acceptable(
+                lambda: scheduler.submit(
+                    user,
+                    trace.wrap_llm(model.generate_content, prompt),
+                    prompt,
+                    generation_config=GENERATION_CONFIG
+                ),
+                lambda response: within_flesch_band(response.text.strip(), score_min, score_max),
+                candidates=config.SPECULATIVE_CANDIDATES,
+                max_calls=config.SPECULATIVE_MAX_CALLS
+            )
+
+            latency = round(time.time() - start, 2)
+            payload = finalize_story(data, response.text.strip(), latency)
+            if story_cache and score_min <= payload["flesch_score"] <= score_max:
+                with span("cache_store"):
+                    story_cache.store(data, payload)
+            return jsonify(payload)
+        except Overloaded as e:
+            trace.outcome = "overloaded"
+            return overloaded_response(e)
+        except Exception as e:
+            trace.outcome = "error"
+            return jsonify({"error": str(e)}), 500
+
+@bp.route("/generate_story/stream", methods=["POST"])
+def generate_story_stream():
+    # Streams NDJSON events: "title", "story" (incremental text), "moral",
+    # "retry" when an attempt misses the FRE band, then a final "done" event
+    # carrying the same payload as /generate_story.
+    data = request.json
+    score_min, score_max = get_flesch_band(data.get("age_range"))
+    cached = story_cache.lookup(data) if story_cache else None
+    user = request_user(data)
+    # The first attempt's scheduler slot is reserved up front so a full queue
+    # still answers 429 with Retry-After before any event is sent
+    reservation = None
+    if not cached:
+        try:
+            reservation = scheduler.reserve(user)
+        except Overloaded as e:
+            return overloaded_response(e)
+
+    def events():
+        nonlocal reservation
+        with start_trace("generate_story_stream", data.get("age_range"), data.get("language"),
+                         record_prompt_outcome) as trace:
+            if cached:
+                trace.outcome = "cache_hit"
+                yield to_ndjson({"event": "title", "text": cached["title"]})
+                yield to_ndjson({"event": "story", "text": cached["story"].split("\nMoral:")[0].strip()})
+                yield to_ndjson({"event": "moral", "text": cached["moral"]})
+                yield to_ndjson({"event": "done", **cached})
+                return
+            with span("prompt_build"):
+                prompt = request_prompt(data)
+            try:
+                start = time.time()
+                for attempt in range(MAX_ATTEMPTS):
+                    try:
+                        reservation.wait()
+                        parser = StoryStreamParser()
+                        attempt_start = time.perf_counter()
+                        chunks = model.generate_content(
+                            prompt,
+                            generation_config=GENERATION_CONFIG,
+                            stream=True
+                        )
+                        for event in iter_story_events(chunks, parser):
+                            yield to_ndjson(event)
+                    finally:
+                        reservation.release()
+                        reservation = None
+                    full_text = parser.full_text.strip()
+                    # The attempt includes the time the client took to read its events
+                    trace.record_llm_call(time.perf_counter() - attempt_start, prompt, chunks, full_text)
+                    if within_flesch_band(full_text, score_min, score_max) or attempt == MAX_ATTEMPTS - 1:
+                        break
+                    try:
+                        reservation = scheduler.reserve(user)
+                    except Overloaded:
+                        # No slot for a retry: keep the story already streamed
+                        break
+                    yield to_ndjson({"event": "retry", "attempt": attempt + 1})
+
+                latency = round(time.time() - start, 2)
+                payload = finalize_story(data, full_text, latency)
+                if story_cache and score_min <= payload["flesch_score"] <= score_max:
+                    with span("cache_store"):
+                        story_cache.store(data, payload)
+                yield to_ndjson({"event": "done", **payload})
+            except Exception as e:
+                trace.outcome = "error"
+                yield to_ndjson({"event": "error", "error": str(e)})
+
+    response = Response(stream_with_context(events()), mimetype="application/x-ndjson")
+    if reservation is not None:
+        # Frees the reserved slot if the client leaves before the stream starts
+        response.call_on_close(lambda: reservation.release() if reservation is not None else None)
+    return response
+
+
+@bp.route("/narration", methods=["POST"])
+def narration():
+    # Segments an already generated story; accepts the /generate_story payload fields
+    data = request.get_json()
+    language = data.get("language", "")
+    story = data.get("story", "")
+    return jsonify(build_narration(
+        data.get("title", ""),
+        story.split("\nMoral:")[0].strip(),
+        data.get("moral", ""),
+        language,
+        data.get("translated_title", ""),
+        data.get("translated_story", ""),
+        data.get("translated_moral", ""),
+        labels=label_map.get(language.lower() if language else "", DEFAULT_LABELS)
+    ))
+
+@bp.route("/narration/audio", methods=["POST"])
+def render_narration_audio():
+    # Renders one narration chunk (or any text) and returns where to fetch it
+    data = request.get_json()
+    text = (data.get("text") or "").strip()
+    if not text:
+        return jsonify({"error": "Missing text"}), 400
+    if len(text) > config.TTS_MAX_CHARS:
+        return jsonify({"error": f"Text is longer than {config.TTS_MAX_CHARS} characters"}), 413
+    lang = data.get("lang") or SPEECH_LANGS.get((data.get("language") or "none").lower(), "en-GB")
+    voice = data.get("voice")
+    if not isinstance(lang, str) or not isinstance(voice, (str, type(None))):
+        return jsonify({"error": "lang and voice must be strings"}), 400
+    try:
+        audio_id, _ = audio_cache.get_or_render(text, lang, voice)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"audio_id": audio_id, "url": f"/narration/audio/{audio_id}"})
+
+@bp.route("/narration/audio/<audio_id>", methods=["GET"])
+def narration_audio(audio_id):
+    path = audio_cache.path(audio_id)
+    if not path:
+        abort(404)
+    # conditional=True answers Range requests with 206 partial content
+    return send_file(path, conditional=True, max_age=31536000)
+
+@bp.route("/narration/audio_cache", methods=["GET"])
+def audio_cache_stats():
+    return jsonify(audio_cache.stats())
+
+@bp.route("/generate_story/batch", methods=["POST"])
+def generate_story_batch():
+    # Streams NDJSON: a "job" event with the job_id, one "item" event per story
+    # as it finishes, then "done". Post {"job_id": ...} alone to resume a job.
+    data = request.get_json()
+    job_id = data.get("job_id")
+    if job_id and batch_runner.progress(job_id) is None:
+        return jsonify({"error": f"Unknown batch job {job_id}"}), 404
+    if not job_id:
+        items = data.get("items") or []
+        if not items or len(items) > config.BATCH_MAX_ITEMS:
+            return jsonify({"error": f"Send between 1 and {config.BATCH_MAX_ITEMS} items"}), 400
+        job_id = batch_runner.create_job(items)
+
+    def events():
+        progress = batch_runner.progress(job_id)
+        yield to_ndjson({"event": "job", "job_id": job_id, "total": progress["total"], "completed": progress["completed"]})
+        try:
+            for index, payload in batch_runner.run(job_id):
+                yield to_ndjson({"event": "item", "index": index, **payload})
+            yield to_ndjson({"event": "done", "job_id": job_id})
+        except Exception as e:
+            yield to_ndjson({"event": "error", "job_id": job_id, "error": str(e)})
+
+    return Response(stream_with_context(events()), mimetype="application/x-ndjson")
+
+@bp.route("/generate_story/batch/<job_id>", methods=["GET"])
+def batch_progress(job_id):
+    progress = batch_runner.progress(job_id)
+    if progress is None:
+        return jsonify({"error": f"Unknown batch job {job_id}"}), 404
+    if request.args.get("results"):
+        progress["results"] = batch_runner.results(job_id)
+    return jsonify(progress)
+
+@bp.before_app_request
+def start_request_profile():
+    # Opt-in cProfile of one request: PROFILE_REQUESTS on and an X-Profile header
+    if config.PROFILE_REQUESTS and request.headers.get("X-Profile"):
+        g.profiler = tracing.start_profile()
+
+@bp.after_app_request
+def add_trace_headers(response):
+    trace = g.get("trace")
+    if trace:
+        response.headers["X-Trace-Id"] = trace.trace_id
+        response.headers["Server-Timing"] = trace.server_timing()
+    profiler = g.pop("profiler", None)
+    if profiler:
+        name = trace.trace_id if trace else f"{request.endpoint}-{int(time.time() * 1000)}"
+        tracing.save_profile(profiler, config.PROFILE_DIR, name)
+        response.headers["X-Profile"] = f"{name}.prof"
+    return response
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    extra = (
+        tracing.gauge_lines("story_scheduler", "Generation scheduler state.", scheduler.stats(), label="stat")
+        + tracing.gauge_lines("story_speculation", "Speculative generation counters.", speculation_stats, label="stat")
+        + tracing.gauge_lines(
+            "story_write_buffer", "Write-behind buffer state.",
+            {key: value for key, value in write_buffer.stats().items() if isinstance(value, (int, float))},
+            label="stat"
+        )
+    )
+    extra += tracing.labelled_gauge_lines(
+        "story_prompt_template_tokens", "Estimated template tokens of the selected prompt variant.",
+        ["variant", "age_band", "language"],
+        [((row["variant"], row["age_range"], row["language"]), row["tokens"]) for row in prompt_selector.report()]
+    )
+    if story_cache:
+        extra += tracing.gauge_lines(
+            "story_cache", "Story cache counters.",
+            {key: value for key, value in story_cache.stats().items() if isinstance(value, (int, float))},
+            label="stat"
+        )
+    return Response(tracing.render_metrics(extra), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/prompt_variants", methods=["GET"])
+def prompt_variants():
+    return jsonify(default=prompt_selector.default, explore=prompt_selector.explore, selected=prompt_selector.report())
+
+@bp.route("/generate_story/queue", methods=["GET"])
+def generation_queue_stats():
+    return jsonify({**scheduler.stats(), "speculation": speculation_stats})
+
+@bp.route("/generate_story/cache", methods=["GET"])
+def story_cache_stats():
+    if not story_cache:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **story_cache.stats()})
+
+@bp.route("/write_buffer", methods=["GET"])
+def write_buffer_stats():
+    return jsonify(write_buffer.stats())
+
+@bp.route("/drift", methods=["GET"])
+def drift_stats():
+    return jsonify(drift_monitor.snapshot())
+
+@bp.route("/drift/baseline", methods=["POST"])
+def freeze_drift_baseline():
+    return jsonify(success=True, baselines=drift_monitor.freeze_baselines())
+
+@bp.route("/analytics/daily", methods=["GET"])
+def daily_analytics():
+    since = request.args.get("since")
+    return jsonify(
+        ratings=rollups.daily("daily_ratings", since),
+        latency=rollups.latency_summary(since),
+        drift=rollups.daily("daily_drift", since)
+    )
+
+@bp.route("/submit_feedback", methods=["POST"])
 def submit_feedback():
     data = request.get_json()
-    feedback_collection.insert_one({
+    write_buffer.put("feedback", {
         "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "age": data.get("age"),
         "genre": data.get("genre"),
@@ -327,7 +614,7 @@ def submit_feedback():
     })
     return jsonify(success=True)
 
-@app.route("/register", methods=["POST"])
+@bp.route("/register", methods=["POST"])
 def register():
     data = request.get_json()
     username = data.get("username")
@@ -336,74 +623,48 @@ def register():
     gmail = data.get("gmail")
     if not username or not password or not mobile or not gmail:
         return jsonify(success=False, message="Missing fields"), 400
+    if not all(isinstance(value, str) for value in (username, password, mobile, gmail)):
+        return jsonify(success=False, message="Fields must be strings"), 400
 
-    # Check if a user with the same username AND password exists
-    if users_collection.find_one({"username": username, "password": password}):
+    if not user_store.register(username, password, mobile, gmail):
         return jsonify(success=False, message="User already registered"), 409
-
-    # Optionally, you can check if username exists with a different password
-    # and show a different message if you want:
-    # if users_collection.find_one({"username": username}):
-    #     return jsonify(success=False, message="Username taken with different password"), 409
-
-    users_collection.insert_one({
-        "username": username,
-        "password": password,
-        "mobile": mobile,
-        "gmail": gmail,
-        "registered_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
     return jsonify(success=True), 201
 
-@app.route("/login", methods=["POST"])
+@bp.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
     username = data.get("username")
     password = data.get("password")
     device_type = data.get("device_type", "web")  # Optional: get device type from frontend
 
-    user = users_collection.find_one({"username": username, "password": password})
+    # A session token from an earlier login skips the credential check
+    auth_header = request.headers.get("Authorization", "")
+    token = data.get("token") or (auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else None)
+    if token is not None and not isinstance(token, str):
+        return jsonify(success=False, message="Invalid token"), 400
+    user = user_store.resolve_token(token)
+    if user:
+        username = user["username"]
+    else:
+        user = user_store.authenticate(username, password)
+        token = user_store.issue_token(user) if user else None
     if user:
         # Save login details to login_logs collection
-        login_logs_collection.insert_one({
+        write_buffer.put("login_logs", {
             "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "user_id": str(user.get("_id")),
+            "user_id": user["user_id"],
             "username": username,
-            "password": password,
             "device_type": device_type
         })
-        return jsonify(success=True)
+        return jsonify(success=True, token=token)
     else:
         return jsonify(success=False), 401
 
-# Language-specific instructions and labels
-language_notes = {
-    "telugu": "Note: Use common Telugu words spoken in Andhra Pradesh and Telangana regions. Avoid Sanskritized or literary Telugu unless necessary.",
-    "hindi": "Note: Use conversational Hindi understood by children in North India. Avoid very formal or Urdu-heavy vocabulary.",
-    "french": "Note: Use simple, conversational French as spoken by children in France. Avoid overly formal or academic language.",
-    "tamil": "Note: Use everyday spoken Tamil familiar to children in Tamil Nadu. Avoid highly literary or classical Tamil.",
-    "kannada": "Note: Use conversational Kannada as spoken by children in Karnataka. Avoid archaic or highly formal words.",
-    "marathi": "Note: Use simple, conversational Marathi as spoken by children in Maharashtra. Avoid overly formal or Sanskritized words.",
-    "bengali": "Note: Use everyday Bengali as spoken by children in West Bengal. Avoid highly literary or archaic words.",
-    # Add more languages as needed
-}
-
-label_map = {
-    "telugu": {"title": "శీర్షిక", "story": "కథ", "moral": "నీతి"},
-    "hindi": {"title": "शीर्षक", "story": "कहानी", "moral": "नीति"},
-    "french": {"title": "Titre", "story": "Histoire", "moral": "Morale"},
-    "tamil": {"title": "தலைப்பு", "story": "கதை", "moral": "நீதிக்கதை"},
-    "kannada": {"title": "ಶೀರ್ಷಿಕೆ", "story": "ಕಥೆ", "moral": "ನೀತಿ"},
-    "marathi": {"title": "शीर्षक", "story": "कथा", "moral": "नीती"},
-    "bengali": {"title": "শিরোনাম", "story": "গল্প", "moral": "নৈতিকতা"},
-    # Add more languages as needed
-}
-
 def log_psi_warning(data, psi, warning, speed, flesch_score, story_length, story_text, title):
     language = data.get("language")
     if language == "none" or not language:
         language = "English"
-    psi_warning_collection.insert_one({
+    write_buffer.put("Drift_warnings", {
         "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "age": data.get("age_range"),
         "genre": data.get("genre"),
@@ -419,5 +680,49 @@ def log_psi_warning(data, psi, warning, speed, flesch_score, story_length, story
         "warning": warning
     })
 
+@bp.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness only: answers without touching MongoDB or Gemini
+    return jsonify(status="ok", pid=os.getpid())
+
+@bp.route("/readyz", methods=["GET"])
+def readyz():
+    checks = {}
+    try:
+        client.admin.command("ping")
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = str(e)
+    try:
+        checks["model"] = "ok" if model else "missing"
+    except Exception as e:
+        checks["model"] = str(e)
+    checks["write_buffer"] = "ok" if write_buffer.thread.is_alive() else "stopped"
+    ready = all(value == "ok" for value in checks.values())
+    return jsonify(ready=ready, pid=os.getpid(), checks=checks), 200 if ready else 503
+
+def warm_up():
+    # Builds this process's clients and workers ahead of the first request
+    for service in (client, db, write_buffer, user_store, drift_monitor, story_cache, model, audio_cache, scheduler,
+                    batch_runner):
+        if isinstance(service, ProcessLocal):
+            service.get()
+
+def create_app(generative_model=None, mongo_client=None):
+    # Builds the Flask app without connecting to anything. A model or Mongo
+    # client passed here (fake model, mongomock) replaces the lazily built one
+    # for this process; pass them before the first request.
+    global model, client
+    if generative_model is not None:
+        model = generative_model
+    if mongo_client is not None:
+        client = mongo_client
+    flask_app = Flask(__name__)
+    CORS(flask_app)
+    flask_app.register_blueprint(bp)
+    return flask_app
+
+app = create_app()
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,202 @@
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from prompts import prompt_template
+from scheduler import Overloaded
+
+# Bulk story generation for classrooms. English-only items that share an age
+# band are packed several to one Gemini call; the rest run one call per item.
+# Every item is validated against its Flesch band on its own and retried alone
+# when it misses. Progress is stored per item in MongoDB so an interrupted
+# job can be resumed; items that failed are tried again on resume.
+STORY_SEPARATOR_RE = re.compile(r"^\s*=+\s*STORY\s+(\d+)\s*=+\s*$", re.MULTILINE | re.IGNORECASE)
+
+
+def packed_prompt(age_range, items):
+    prompt = prompt_template(age_range, "none").format(
+        genre="(given per story below)",
+        characters="(given per story below)",
+        theme="(given per story below)"
+    )
+    prompt += f"\n\nWrite {len(items)} different stories that each follow ALL of the requirements above, one for each of these:\n"
+    for number, item in enumerate(items, 1):
+        prompt += f"- Story {number}: Genre: {item.get('genre')}; Main Characters: {item.get('characters')}; Theme: {item.get('theme')}\n"
+    prompt += (
+        "\nStart every story with a line containing only '=== STORY n ===' (n is the story number), "
+        "followed by that story in the Title / story text / Moral format."
+    )
+    return prompt
+
+
+def split_packed(text, count):
+    parts = STORY_SEPARATOR_RE.split(text)
+    stories = {}
+    # parts = [preamble, number, story, number, story, ...]
+    for number, story in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count and story.strip():
+            stories[index] = story.strip()
+    return stories
+
+
+class RateLimiter:
+    # Token bucket shared by all workers of a job
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self.next_slot = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BatchRunner:
+    def __init__(self, jobs_collection, generate, finalize, within_band, get_band, build_prompt,
+                 pack_size=5, max_attempts=3, per_minute=60, workers=4):
+        self.jobs = jobs_collection
+        self.generate = generate
+        self.finalize = finalize
+        self.within_band = within_band
+        self.get_band = get_band
+        self.build_prompt = build_prompt
+        self.pack_size = pack_size
+        self.max_attempts = max_attempts
+        self.per_minute = per_minute
+        self.workers = workers
+
+    def create_job(self, items, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        self.jobs.insert_one({
+            "_id": job_id,
+            "status": "pending",
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "items": items,
+            "total": len(items),
+            "completed": 0,
+            "failed": 0,
+            "results": {},
+        })
+        return job_id
+
+    def progress(self, job_id):
+        return self.jobs.find_one({"_id": job_id}, {"items": 0, "results": 0})
+
+    def results(self, job_id):
+        job = self.jobs.find_one({"_id": job_id}, {"results": 1})
+        return job["results"] if job else None
+
+    def _call(self, job_id, prompt, limiter):
+        # Waits out backpressure instead of failing the job
+        while True:
+            limiter.acquire()
+            try:
+                return self.generate(job_id, prompt)
+            except Overloaded as e:
+                time.sleep(e.retry_after)
+
+    def _single(self, job_id, item, limiter, attempts):
+        score_min, score_max = self.get_band(item.get("age_range"))
+        prompt = self.build_prompt(item)
+        start = time.time()
+        for attempt in range(attempts):
+            text = self._call(job_id, prompt, limiter)
+            if self.within_band(text, score_min, score_max):
+                break
+        return self.finalize(item, text, round(time.time() - start, 2))
+
+    def _item(self, job_id, item, limiter, attempts):
+        # A failing item (a safety block, an item that is not a dict) is stored
+        # as an error result so the rest of the job still finishes
+        try:
+            return self._single(job_id, item, limiter, attempts)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    def _packed(self, job_id, indexed_items, limiter):
+        items = [item for _, item in indexed_items]
+        score_min, score_max = self.get_band(items[0].get("age_range"))
+        start = time.time()
+        text = self._call(job_id, packed_prompt(items[0].get("age_range"), items), limiter)
+        latency = round(time.time() - start, 2)
+        stories = split_packed(text, len(items))
+        results = []
+        for position, (index, item) in enumerate(indexed_items):
+            story = stories.get(position)
+            if story is not None and self.within_band(story, score_min, score_max):
+                results.append((index, self.finalize(item, story, latency)))
+            else:
+                # Missing or out of band: retry this item on its own
+                results.append((index, self._item(job_id, item, limiter, self.max_attempts - 1 or 1)))
+        return results
+
+    def _plan(self, pending):
+        groups = {}
+        tasks = []
+        for index, item in pending:
+            language = (item.get("language") or "none").lower() if isinstance(item, dict) else None
+            if self.pack_size > 1 and language == "none":
+                groups.setdefault(item.get("age_range"), []).append((index, item))
+            else:
+                tasks.append([(index, item)])
+        for group in groups.values():
+            tasks += [group[i:i + self.pack_size] for i in range(0, len(group), self.pack_size)]
+        return tasks
+
+    def _run_task(self, job_id, task, limiter):
+        results = None
+        if len(task) > 1:
+            try:
+                results = self._packed(job_id, task, limiter)
+            except Exception:
+                # The packed call itself failed: fall back to one call per item
+                results = None
+        if results is None:
+            results = [(index, self._item(job_id, item, limiter, self.max_attempts)) for index, item in task]
+        # Saved from the worker so finished items survive a dropped stream;
+        # errors are stored too but only successes count as completed
+        for index, payload in results:
+            update = {"$set": {f"results.{index}": payload}}
+            if "error" not in payload:
+                update["$inc"] = {"completed": 1}
+            self.jobs.update_one({"_id": job_id}, update)
+        return results
+
+    def run(self, job_id):
+        # Yields (index, payload) as items finish; items finished by an earlier
+        # run of the same job are skipped, items that failed are run again.
+        job = self.jobs.find_one({"_id": job_id})
+        if job is None:
+            raise KeyError(job_id)
+        pending = [
+            (i, item) for i, item in enumerate(job["items"])
+            if str(i) not in job["results"] or "error" in job["results"][str(i)]
+        ]
+        self.jobs.update_one({"_id": job_id}, {"$set": {"status": "running"}})
+        limiter = RateLimiter(self.per_minute)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = []
+            for task in self._plan(pending):
+                futures.append(executor.submit(self._run_task, job_id, task, limiter))
+            try:
+                for future in as_completed(futures):
+                    for index, payload in future.result():
+                        yield index, payload
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                self.jobs.update_one({"_id": job_id}, {"$set": {"status": "interrupted"}})
+                raise
+        results = self.results(job_id)
+        failed = sum(1 for payload in results.values() if "error" in payload)
+        self.jobs.update_one({"_id": job_id}, {"$set": {"status": "done", "failed": failed}})
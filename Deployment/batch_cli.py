@@ -0,0 +1,61 @@
+# Generate many stories in one job without going through HTTP.
+#
+#   cd Deployment
+#   python batch_cli.py classroom.json --out stories.jsonl
+#   python batch_cli.py --resume <job_id> --out stories.jsonl
+#
+# The input is a JSON list (or JSON lines) of /generate_story request bodies.
+# Progress is stored in the batch_jobs collection, so an interrupted run can be
+# resumed with --resume and only the unfinished items are generated.
+import argparse
+import json
+import sys
+
+import app as story_app
+
+
+def load_items(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("items", nargs="?", help="JSON or JSONL file of story parameter sets")
+    parser.add_argument("--resume", metavar="JOB_ID", help="continue an earlier job")
+    parser.add_argument("--out", help="append finished stories here as JSON lines (default: stdout)")
+    args = parser.parse_args()
+
+    runner = story_app.batch_runner
+    if args.resume:
+        job_id = args.resume
+        if runner.progress(job_id) is None:
+            parser.error(f"unknown job {job_id}")
+    elif args.items:
+        job_id = runner.create_job(load_items(args.items))
+    else:
+        parser.error("give an items file or --resume JOB_ID")
+
+    progress = runner.progress(job_id)
+    print(f"job {job_id}: {progress['completed']}/{progress['total']} already done", file=sys.stderr)
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for index, payload in runner.run(job_id):
+            out.write(json.dumps({"job_id": job_id, "index": index, **payload}, ensure_ascii=False) + "\n")
+            out.flush()
+            if "error" in payload:
+                print(f"item {index} failed: {payload['error']}", file=sys.stderr)
+            else:
+                print(f"item {index} done (flesch {payload['flesch_score']})", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        story_app.write_buffer.flush()
+    print(f"job {job_id} finished", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
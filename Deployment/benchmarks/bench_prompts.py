@@ -0,0 +1,201 @@
+# Micro-benchmark: prompt building and response parsing in prompts.py versus
+# the previous per-request code (f-string prompt rebuilt on every call and
+# regexes compiled from dynamic patterns, with the English section parsed
+# twice).
+#
+#   cd Deployment
+#   python -m benchmarks.bench_prompts --repeat 2000
+import argparse
+import json
+import os
+import re
+import timeit
+
+import prompts
+from prompts import DEFAULT_LABELS, get_flesch_band, label_map, language_notes
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "recorded_outputs.jsonl")
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def legacy_build_prompt(age_range, genre, theme, characters, language):
+    # Prompt construction as done in generate_story before prompts.build_prompt,
+    # assembled from f-strings on every request
+    score_min, score_max = get_flesch_band(age_range)
+    flesch_score = f"{score_min}–{score_max}"
+
+    prompt = f"""
+    Write an imaginative and age-appropriate story for Indian children aged {age_range}.
+
+    Requirements:
+    - Genre: {genre}
+    - Main Characters: {characters}
+    - Theme: {theme}
+    - Story Length: Maximum 350 words.
+    - Use simple, clear English vocabulary and sentence structure that is suitable for children aged {age_range}.
+    - The story MUST be written so that its Flesch Reading Ease (FRE) score is between {flesch_score}. 
+    - The Flesch score requirement applies ONLY to the English story.
+    - DO NOT include any translation, non-English words, or translation labels in the English story section.
+    - Avoid complex words and long sentences for younger ages; use more advanced language for older ages.
+    - Include a catchy, relevant title at the beginning.
+    - End with a moral in the format: Moral: [your moral]
+    - **Do NOT add any label like 'English Story:' or similar. Only use 'Title:', the story text, and 'Moral:' as shown below.**
+
+    Format:
+    Title: [Your title]
+    [Story text]
+    Moral: [your moral]
+    """
+
+    if age_range in ["3-5", "3-8"]:
+        prompt += (
+            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 80 and 100."
+            "\n- Use normal words and keep medium sentences (6-9 words each)."
+            "\n- Avoid any very easy or very complex vocabulary."
+            "\n- Imagine you are writing for a 3–8 year old who is just learning to read."
+            "\n- If the story is  very easy or more difficult, REWRITE it until it fits the FRE score range."
+            "\n- Do NOT write a story that is outside this FRE score range."
+            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+        )
+    elif age_range in ["9-15"]:
+        prompt += (
+            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 60 and 80."
+            "\n- The FRE score must NEVER be above 80 or below 60 for this age group."
+            "\n- Use simple and clear words."
+            "\n- Keep sentences short (10–14 words) and easy to understand."
+            "\n- Avoid difficult vocabulary and long sentences."
+            "\n- Do not use advanced or academic words."
+            "\n- Imagine you are writing for a school student aged 9 to 15."
+            "\n- If the story is too easy or too hard, or if the FRE score is outside 60–80, REWRITE it until it fits the FRE score range."
+            "\n- You absolutely MUST NOT write a story with a Flesch score above 80 or below 60."
+            "\n- Do NOT write a story that is outside this FRE score range."
+            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+            "\n- EVEN WHEN TRANSLATING TO ANOTHER LANGUAGE, NEVER GO OUTSIDE THE FRE SCORE RANGE OF 60–80."
+            "\n- Repeat: The story (and any translation) MUST have a Flesch Reading Ease (FRE) score between 60 and 80."
+        )
+    elif age_range in ["16-19"]:
+        prompt += (
+            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 50 and 60."
+            "\n- Use clear language with some moderately advanced vocabulary."
+            "\n- Keep most sentences between 10 and 16 words."
+            "\n- Mix simple and moderately complex sentences, but avoid very long or academic sentences."
+            "\n- Do not use too many advanced words."
+            "\n- Write as you would for a high school student aged 16 to 19."
+            "\n- If the story is too easy or too hard, REWRITE it until it fits the FRE score range."
+            "\n- Do NOT write a story that is outside this FRE score range."
+            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+        )
+    elif age_range in ["20+"]:
+        prompt += (
+            "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 30 and 50."
+            "\n- Aim for a FRE score between 40 and 45. Do NOT write a story with a FRE score below 35 or above 45."
+            "\n- Use advanced vocabulary, medium sentences, and  complex sentence structures."
+            "\n- Do not simplify the language. Write as you would for college students or adults."
+            "\n- If the story is very too easy (FRE > 50) or very too hard (FRE < 30), REWRITE it until it fits the FRE score range."
+            "\n- Do NOT write a story that is outside this FRE score range."
+            "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+            "\n- If you do not follow the FRE rule, your answer will be rejected and regenerated."
+        )
+
+    if language and language.lower() != "none":
+        lang_key = language.lower()
+        labels = label_map.get(lang_key, {
+            "title": "Title",
+            "story": "Story",
+            "moral": "Moral"
+        })
+        prompt += f"""
+
+After you have finished the English story above, translate ONLY the English story and its moral into {language} for Indian children.
+
+**Translation Instructions:**
+- Do NOT translate word-for-word. Use natural, fluent, and child-friendly {language} as used in everyday conversation.
+- Ensure the translated story is easy for children in the target age group to understand.
+- Use age-appropriate vocabulary and grammar for {language}.
+- Do NOT include any English words unless they are proper nouns.
+- Write ONLY the translated version, using these labels (translated in {language}):
+    - {labels['title']}: [Translated title]
+    - {labels['story']}: [Translated story]
+    - {labels['moral']}: [Translated moral]
+- DO NOT repeat the English story or moral.
+- DO NOT include any English text in this section (except proper nouns).
+- Structure:
+    {labels['title']}: [Translated title]
+    {labels['story']}: [Translated story]
+    {labels['moral']}: [Translated moral]
+- Even when translating to {language}, ensure the story would have a Flesch Reading Ease (FRE) score in the same range as required for English. Do NOT make the translation easier or harder than the English version. Do NOT go outside the FRE range for the selected age group, even in translation.
+"""
+        # Add language-specific note if available
+        if lang_key in language_notes:
+            prompt += f"\n{language_notes[lang_key]}"
+    return prompt
+
+
+def legacy_parse(full_text, language):
+    # Parsing as done in generate_story before prompts.parse_story
+    english_section = re.search(r"Title:.*?(?:\n|\r\n)(.*?)(?:\n|\r\n)Moral:\s*(.*)", full_text, re.DOTALL)
+    if english_section:
+        english_section.group(1).strip()
+
+    match = re.search(r"Title:\s*(.*)", full_text)
+    if match:
+        title = match.group(1).strip()
+        story = full_text.replace(match.group(0), "").strip()
+    else:
+        title = full_text.split("\n")[0].strip()
+        story = "\n".join(full_text.split("\n")[1:]).strip()
+    moral_match = re.search(r"Moral:\s*(.*)", story)
+    moral = moral_match.group(1).strip() if moral_match else ""
+
+    english_section = re.search(r"Title:.*?(?:\n|\r\n)(.*?)(?:\n|\r\n)Moral:\s*(.*)", full_text, re.DOTALL)
+    story_body = None
+    if english_section:
+        story_body = english_section.group(1).strip()
+        moral = english_section.group(2).strip()
+
+    translated = {"title": "", "story": "", "moral": ""}
+    if language and language.lower() != "none":
+        labels = label_map.get(language.lower(), DEFAULT_LABELS)
+        translation_match = re.search(rf"Translation in {language}:(.*)", story, re.DOTALL | re.IGNORECASE)
+        translation_text = translation_match.group(1).strip() if translation_match else ""
+        title_match = re.search(rf"{labels['title']}[:：]?\s*(.*)", translation_text)
+        if title_match:
+            translated["title"] = title_match.group(1).strip()
+        story_match = re.search(rf"{labels['story']}[:：]?\s*([\s\S]*?)(?:\n{labels['moral']}[:：]?|$)", translation_text)
+        if story_match:
+            translated["story"] = story_match.group(1).strip()
+        moral_match_trans = re.search(rf"{labels['moral']}[:：]?\s*(.*)", translation_text)
+        if moral_match_trans:
+            translated["moral"] = moral_match_trans.group(1).strip()
+    return title, story, story_body, moral, translated
+
+
+def bench(label, fn, corpus, repeat):
+    seconds = timeit.timeit(lambda: [fn(record) for record in corpus], number=repeat)
+    per_call = seconds / (repeat * len(corpus)) * 1e6
+    print(f"{label:<28} {per_call:8.2f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+    corpus = load_corpus(args.corpus)
+    prompt_args = lambda r: (r["age_range"], "Adventure", "Friendship", "Riya, Arun", r["language"])
+
+    old = bench("build_prompt (legacy)", lambda r: legacy_build_prompt(*prompt_args(r)), corpus, args.repeat)
+    new = bench("build_prompt (prompts.py)", lambda r: prompts.build_prompt(*prompt_args(r)), corpus, args.repeat)
+    print(f"{'':<28} {old / new:8.1f}x faster\n")
+    old = bench("parse (legacy)", lambda r: legacy_parse(r["text"], r["language"]), corpus, args.repeat)
+    new = bench("parse (prompts.py)", lambda r: prompts.parse_story(r["text"], r["language"]), corpus, args.repeat)
+    print(f"{'':<28} {old / new:8.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
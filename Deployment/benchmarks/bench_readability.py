@@ -0,0 +1,78 @@
+# Benchmark readability.py against textstat on a synthetic corpus of stories
+# assembled from the sentences of the recorded Gemini outputs.
+#
+#   cd Deployment
+#   python -m benchmarks.bench_readability --stories 5000
+import argparse
+import random
+import time
+
+import textstat
+
+import readability
+from benchmarks.bench_prompts import load_corpus
+from narration import split_sentences
+from prompts import parse_story
+
+
+def build_corpus(count, seed=1):
+    english, translated = [], {}
+    for record in load_corpus():
+        parsed = parse_story(record["text"], record["language"])
+        english += split_sentences(parsed["story_body"])
+        if parsed["translated_story"]:
+            translated.setdefault(record["language"], []).extend(split_sentences(parsed["translated_story"]))
+    rng = random.Random(seed)
+    stories = [" ".join(rng.sample(english, rng.randint(8, 20))) for _ in range(count)]
+    translations = [
+        (language, " ".join(rng.choices(sentences, k=rng.randint(5, 15))))
+        for language, sentences in translated.items()
+        for _ in range(count // len(translated))
+    ]
+    return stories, translations
+
+
+def timed(fn, texts):
+    started = time.perf_counter()
+    scores = [fn(text) for text in texts]
+    return time.perf_counter() - started, scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=5000)
+    args = parser.parse_args()
+    stories, translations = build_corpus(args.stories)
+
+    textstat_time, expected = timed(textstat.flesch_reading_ease, stories)
+    readability.flesch_reading_ease.cache_clear()
+    native_time, actual = timed(readability.flesch_reading_ease, stories)
+    mismatches = sum(1 for a, b in zip(expected, actual) if abs(a - b) > 0.01)
+    # generate_story scores each story twice: FRE band check, then the payload
+    textstat.textstat._cache_clear()
+    textstat_twice, _ = timed(lambda text: (textstat.flesch_reading_ease(text), textstat.flesch_reading_ease(text)), stories)
+    readability.flesch_reading_ease.cache_clear()
+    native_twice, _ = timed(
+        lambda text: (readability.flesch_reading_ease(text), readability.flesch_reading_ease(text)), stories
+    )
+
+    print(f"{len(stories)} English stories")
+    print(f"  textstat               {textstat_time / len(stories) * 1e6:9.1f} us/story")
+    print(f"  readability            {native_time / len(stories) * 1e6:9.1f} us/story  {textstat_time / native_time:5.1f}x")
+    print(f"  textstat, scored twice {textstat_twice / len(stories) * 1e6:9.1f} us/story")
+    print(f"  readability, twice     {native_twice / len(stories) * 1e6:9.1f} us/story  {textstat_twice / native_twice:5.1f}x")
+    print(f"  scores differing from textstat by more than 0.01: {mismatches}")
+
+    readability.flesch_reading_ease.cache_clear()
+    started = time.perf_counter()
+    by_language = {}
+    for language, text in translations:
+        by_language.setdefault(language, []).append(readability.flesch_reading_ease(text, language))
+    elapsed = time.perf_counter() - started
+    print(f"{len(translations)} translated stories: {elapsed / len(translations) * 1e6:.1f} us/story")
+    for language, scores in sorted(by_language.items()):
+        print(f"  {language:<8} mean FRE {sum(scores) / len(scores):6.2f}")
+
+
+if __name__ == "__main__":
+    main()
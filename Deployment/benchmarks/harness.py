@@ -0,0 +1,271 @@
+# Offline load and regression benchmark for the Flask app.
+#
+#   cd Deployment
+#   python -m benchmarks.harness --workers 16 --requests 400 --latency lognormal:0,0.4 --pass-rate 0.7
+#   python -m benchmarks.harness --mix generate_story=1 --compare benchmarks/results/<earlier>.json
+#
+# The app is built with app.create_app, given a mongomock client for MongoDB and
+# fake_gemini.ReplayGenerativeModel for Gemini, which replays benchmarks/data/recorded_outputs.jsonl
+# with the configured latency distribution and FRE pass rate. `--workers`
+# threads issue `--requests` requests in total, drawn from the endpoint mix, through
+# Flask's test client (or against a running server with --url). Throughput and
+# p50/p95/p99 latency per endpoint are printed and saved as JSON under
+# benchmarks/results/, named after the current commit, so runs can be compared.
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+import mongomock
+
+import app as story_app
+import config
+from benchmarks.bench_prompts import CORPUS
+from fake_gemini import ReplayGenerativeModel, load_recorded
+from prompts import get_flesch_band
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+GENRES = ["Adventure", "Fantasy", "Mystery", "Animal Story", "Science Fiction"]
+THEMES = ["Friendship", "Courage", "Honesty", "Kindness", "Teamwork"]
+BENCH_USERS = 20
+DEFAULT_MIX = "generate_story=6,generate_story/stream=2,submit_feedback=2,login=2,narration=1,metrics=1"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return round(values[int(pct / 100 * (len(values) - 1))], 4) if values else 0
+
+
+def story_body(rng, records):
+    record = rng.choice(records)
+    return {
+        "username": f"bench{rng.randrange(BENCH_USERS)}",
+        "age_range": record["age_range"],
+        "language": record["language"],
+        "genre": rng.choice(GENRES),
+        "theme": rng.choice(THEMES),
+        "characters": rng.choice(["Riya", "Kabir", "Meera, Arjun"]),
+    }
+
+
+def build_request(endpoint, rng, records):
+    # Returns (method, path, body) for one request of the given endpoint
+    if endpoint in ("generate_story", "generate_story/stream"):
+        return "POST", f"/{endpoint}", story_body(rng, records)
+    if endpoint == "submit_feedback":
+        body = story_body(rng, records)
+        return "POST", "/submit_feedback", {**body, "rating": rng.randint(1, 5), "latency": f"{rng.uniform(1, 10):.2f} sec",
+                                            "flesch_score": rng.uniform(30, 100), "story_length": 900}
+    if endpoint == "login":
+        return "POST", "/login", {"username": f"bench{rng.randrange(BENCH_USERS)}", "password": "bench-password"}
+    if endpoint == "narration":
+        record = rng.choice(records)
+        story = record["text"].split("\n", 1)[1]
+        return "POST", "/narration", {"title": "Bench", "story": story, "moral": "", "language": record["language"]}
+    if endpoint == "metrics":
+        return "GET", "/metrics", None
+    raise ValueError(f"Unknown endpoint in mix: {endpoint}")
+
+
+class TestClientTransport:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def send(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        # Read the whole body so streamed responses are timed to the last event
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def fre_pass(endpoint, body, content):
+    # Whether a generated story landed in its age band (None for other endpoints)
+    if not endpoint.startswith("generate_story"):
+        return None
+    try:
+        payload = json.loads(content.decode().strip().splitlines()[-1])
+    except ValueError:
+        return None
+    if "flesch_score" not in payload:
+        return None
+    score_min, score_max = get_flesch_band(body["age_range"])
+    return score_min <= payload["flesch_score"] <= score_max
+
+
+def run(transport, mix, workers, total, records, seed):
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    passes = defaultdict(list)
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            endpoint = rng.choices(endpoints, weights)[0]
+            method, path, body = build_request(endpoint, rng, records)
+            started = time.perf_counter()
+            status, content = transport.send(method, path, body)
+            elapsed = time.perf_counter() - started
+            passed = fre_pass(endpoint, body, content) if status == 200 else None
+            with lock:
+                statuses[endpoint][status] += 1
+                if status == 200:
+                    latencies[endpoint].append(elapsed)
+                if passed is not None:
+                    passes[endpoint].append(passed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints_report = {}
+    for endpoint in endpoints:
+        values = latencies[endpoint]
+        count = sum(statuses[endpoint].values())
+        endpoints_report[endpoint] = {
+            "requests": count,
+            "ok": len(values),
+            "statuses": {str(k): v for k, v in sorted(statuses[endpoint].items())},
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "mean": round(sum(values) / len(values), 4) if values else 0,
+        }
+        if passes[endpoint]:
+            endpoints_report[endpoint]["fre_pass_rate"] = round(sum(passes[endpoint]) / len(passes[endpoint]), 3)
+    return {"elapsed_sec": round(elapsed, 3), "throughput_rps": round(total / elapsed, 2), "endpoints": endpoints_report}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                               check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        endpoint, _, weight = part.partition("=")
+        mix[endpoint.strip()] = float(weight or 1)
+    return mix
+
+
+def print_report(report, baseline=None):
+    print(f"{report['commit']}: {report['requests']} requests in {report['elapsed_sec']} sec "
+          f"({report['throughput_rps']} req/s)")
+    header = f"{'endpoint':24} {'ok':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'fre':>6}"
+    print(header)
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:24} {row['ok']:>6} {row['throughput_rps']:>8} {row['p50']:>8} {row['p95']:>8} "
+              f"{row['p99']:>8} {row.get('fre_pass_rate', ''):>6}")
+        old = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if old:
+            deltas = " ".join(
+                f"{key} {(row[key] - old[key]) / old[key] * 100:+.1f}%"
+                for key in ("throughput_rps", "p50", "p95", "p99") if old.get(key)
+            )
+            print(f"{'  vs ' + baseline['commit']:24} {deltas}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="total requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated endpoint=weight pairs")
+    parser.add_argument("--latency", default="lognormal:-1,0.5", help="fake Gemini latency distribution")
+    parser.add_argument("--pass-rate", type=float, default=0.7, help="share of fake outputs inside the FRE band")
+    parser.add_argument("--corpus", default=CORPUS, help="recorded Gemini outputs (JSON lines)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--story-cache", action="store_true", help="keep the story cache (off so every story calls the model)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--label", default="", help="added to the result file name")
+    parser.add_argument("--out", default=RESULTS_DIR, help="directory for the result JSON")
+    parser.add_argument("--compare", help="earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    records = load_recorded(args.corpus)
+    model = ReplayGenerativeModel(load_recorded(args.corpus), latency=args.latency, pass_rate=args.pass_rate,
+                                  seed=args.seed)
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        flask_app = story_app.create_app(generative_model=model, mongo_client=mongomock.MongoClient())
+        if not args.story_cache:
+            story_app.story_cache = None
+        transport = TestClientTransport(flask_app)
+    for i in range(BENCH_USERS):
+        transport.send("POST", "/register", {"username": f"bench{i}", "password": "bench-password",
+                                             "mobile": "0000000000", "gmail": f"bench{i}@example.com"})
+
+    mix = parse_mix(args.mix)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "workers": args.workers,
+        "requests": args.requests,
+        "mix": mix,
+        "model": {"latency": args.latency, "pass_rate": args.pass_rate, "seed": args.seed},
+        "target": args.url or "in-process",
+        "config": {
+            "MAX_IN_FLIGHT_GENERATIONS": config.MAX_IN_FLIGHT_GENERATIONS,
+            "MAX_QUEUED_GENERATIONS": config.MAX_QUEUED_GENERATIONS,
+            "SPECULATIVE_CANDIDATES": config.SPECULATIVE_CANDIDATES,
+            "story_cache": bool(args.story_cache and story_app.story_cache),
+        },
+        **run(transport, mix, args.workers, args.requests, records, args.seed),
+    }
+    if not args.url:
+        report["llm_calls"] = model.calls
+
+    os.makedirs(args.out, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}{'-' + args.label if args.label else ''}.json"
+    path = os.path.join(args.out, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"saved {path}")
+    story_app.write_buffer.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Login throughput with a large synthetic user collection.
+#
+#   cd Deployment
+#   python -m benchmarks.login_throughput --users 1000000 --logins 2000
+#   python -m benchmarks.login_throughput --mongo-uri mongodb://localhost:27017/
+#
+# Without --mongo-uri the collection lives in mongomock, which ignores indexes,
+# so only the cache and token paths are meaningful there. Against a local
+# mongod the "legacy" row is the old unindexed username+password query.
+import argparse
+import random
+import time
+
+from user_store import UserStore, hash_password
+
+PASSWORD = "synthetic-password"
+
+
+def make_collection(args):
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        collection = MongoClient(args.mongo_uri)["story_app_bench"]["users"]
+    else:
+        import mongomock
+        collection = mongomock.MongoClient()["story_app_bench"]["users"]
+    collection.drop()
+    return collection
+
+
+def load_users(collection, count, iterations):
+    # Every synthetic user shares one hash so loading does not take hours
+    password_hash = hash_password(PASSWORD, iterations)
+    batch = []
+    for i in range(count):
+        batch.append({"username": f"user{i}", "password_hash": password_hash, "password": PASSWORD})
+        if len(batch) == 10000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def measure(label, fn, usernames):
+    started = time.time()
+    ok = sum(1 for username in usernames if fn(username))
+    elapsed = time.time() - started
+    print(f"{label:<32} {len(usernames) / elapsed:10.1f} logins/sec  ({ok}/{len(usernames)} ok)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200000, help="PBKDF2 iterations")
+    parser.add_argument("--mongo-uri", default=None)
+    args = parser.parse_args()
+
+    collection = make_collection(args)
+    started = time.time()
+    load_users(collection, args.users, args.iterations)
+    print(f"loaded {args.users} users in {time.time() - started:.1f} sec")
+
+    rng = random.Random(1)
+    # A small hot set so repeat logins can hit the cache, as real users do
+    hot = [f"user{rng.randrange(args.users)}" for _ in range(max(1, args.logins // 10))]
+    usernames = [rng.choice(hot) for _ in range(args.logins)]
+
+    measure("legacy (username+password scan)",
+            lambda u: collection.find_one({"username": u, "password": PASSWORD}), usernames[:200])
+
+    store = UserStore(collection, iterations=args.iterations)
+    started = time.time()
+    store.ensure_indexes()
+    print(f"index build: {time.time() - started:.1f} sec")
+    measure("indexed + hash (cold cache)",
+            lambda u: store.authenticate(u, PASSWORD) and store.credentials.pop(u) is None, usernames[:200])
+    measure("indexed + hash + TTL cache", lambda u: store.authenticate(u, PASSWORD), usernames)
+    tokens = {u: store.issue_token(store.authenticate(u, PASSWORD)) for u in hot}
+    measure("session token", lambda u: store.resolve_token(tokens[u]), usernames)
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
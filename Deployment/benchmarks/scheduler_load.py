@@ -0,0 +1,78 @@
+# Load test for the generation scheduler with a sleeping fake Gemini.
+#
+#   cd Deployment
+#   python -m benchmarks.scheduler_load --users 20 --requests 5 --latency 2
+#
+# Requires mongomock so no local MongoDB is needed.
+import argparse
+import threading
+import time
+from collections import Counter
+
+import mongomock
+import pymongo
+
+pymongo.MongoClient = mongomock.MongoClient
+
+import app as story_app
+from fake_gemini import FakeGenerativeModel
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return round(values[int(pct / 100 * (len(values) - 1))], 3) if values else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5, help="story requests per user")
+    parser.add_argument("--latency", type=float, default=2.0, help="fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--logins", type=int, default=50, help="login requests issued during the burst")
+    args = parser.parse_args()
+
+    story_app.model = FakeGenerativeModel(latency=args.latency, jitter=args.jitter, seed=1)
+    client = story_app.app.test_client()
+    statuses = Counter()
+    story_latencies = []
+    login_latencies = []
+    lock = threading.Lock()
+
+    def story_worker(user):
+        for _ in range(args.requests):
+            started = time.time()
+            response = client.post("/generate_story", json={
+                "username": f"user{user}", "age_range": "3-8", "genre": "Adventure",
+                "theme": "Friendship", "characters": "Riya", "language": "none",
+            })
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    story_latencies.append(time.time() - started)
+
+    def login_worker():
+        for _ in range(args.logins):
+            started = time.time()
+            client.post("/login", json={"username": "nobody", "password": "x"})
+            login_latencies.append(time.time() - started)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=story_worker, args=(u,)) for u in range(args.users)]
+    threads.append(threading.Thread(target=login_worker))
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+
+    print(f"elapsed: {elapsed:.2f} sec")
+    print(f"status codes: {dict(statuses)}")
+    print(f"story latency p50={percentile(story_latencies, 50)} p95={percentile(story_latencies, 95)} sec")
+    print(f"login latency p50={percentile(login_latencies, 50)} p95={percentile(login_latencies, 95)} sec")
+    print(f"scheduler: {story_app.scheduler.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Startup time and per-worker memory.
+#
+#   cd Deployment
+#   python -m benchmarks.startup                # single process, fresh interpreter per run
+#   python -m benchmarks.startup --gunicorn 4   # gunicorn workers (needs gunicorn)
+#
+# The single-process mode times importing the app, the first /healthz, warming
+# up the per-process services (what every import used to do before
+# create_app) and the first /readyz, and reads the resident memory after each
+# step. The gunicorn mode starts wsgi:app with STORY_OFFLINE=1, times how long
+# until /healthz and /readyz answer, and reports RSS and PSS per worker
+# (Linux /proc; PSS counts pages shared after fork only fractionally).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DEPLOYMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, time
+started = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+
+import mongomock, pymongo
+pymongo.MongoClient = mongomock.MongoClient
+base = rss_mb()
+t = time.perf_counter()
+import app as story_app
+from fake_gemini import FakeGenerativeModel
+flask_app = story_app.create_app(generative_model=FakeGenerativeModel(latency=0))
+result = {"baseline_rss_mb": base, "import_sec": time.perf_counter() - t, "import_rss_mb": rss_mb()}
+client = flask_app.test_client()
+t = time.perf_counter()
+assert client.get("/healthz").status_code == 200
+result["first_healthz_sec"] = time.perf_counter() - t
+t = time.perf_counter()
+story_app.warm_up()
+result["warm_up_sec"] = time.perf_counter() - t
+result["warm_rss_mb"] = rss_mb()
+t = time.perf_counter()
+result["readyz_status"] = client.get("/readyz").status_code
+result["first_readyz_sec"] = time.perf_counter() - t
+result["ready_total_sec"] = time.perf_counter() - started
+story_app.close_services()
+print(json.dumps(result))
+"""
+
+
+def single_process(runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", CHILD], cwd=DEPLOYMENT_DIR, capture_output=True, text=True,
+                                check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    report = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        report[key] = round(statistics.median(values), 4) if isinstance(values[0], float) else values[0]
+    return report
+
+
+def proc_memory_mb(pid):
+    memory = {}
+    for path, fields in ((f"/proc/{pid}/status", ("VmRSS",)), (f"/proc/{pid}/smaps_rollup", ("Pss",))):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name = line.split(":")[0]
+                    if name in fields:
+                        memory[name.lower() + "_mb"] = round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+    return memory
+
+
+def child_pids(pid):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(pids)
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.05)
+    return False
+
+
+def gunicorn(workers, port):
+    env = {**os.environ, "STORY_OFFLINE": "1", "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{port}"}
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                              cwd=DEPLOYMENT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + 60
+        base = f"http://127.0.0.1:{port}"
+        if not wait_for(base + "/healthz", deadline):
+            raise RuntimeError("gunicorn did not answer /healthz")
+        healthz_sec = time.perf_counter() - started
+        if not wait_for(base + "/readyz", deadline):
+            raise RuntimeError("gunicorn did not become ready")
+        readyz_sec = time.perf_counter() - started
+        # Let every worker finish booting and warming up before reading memory
+        while len(child_pids(server.pid)) < workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        time.sleep(1)
+        worker_memory = [proc_memory_mb(pid) for pid in child_pids(server.pid)]
+        return {
+            "workers": workers,
+            "healthz_sec": round(healthz_sec, 3),
+            "readyz_sec": round(readyz_sec, 3),
+            "master": proc_memory_mb(server.pid),
+            "worker_memory": worker_memory,
+            "pss_total_mb": round(sum(m.get("pss_mb", 0) for m in worker_memory), 1),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the single-process timing")
+    parser.add_argument("--gunicorn", type=int, metavar="WORKERS", help="also measure a gunicorn server")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    print(json.dumps({"single_process": single_process(args.runs)}, indent=2))
+    if args.gunicorn:
+        print(json.dumps({"gunicorn": gunicorn(args.gunicorn, args.port)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,87 @@
 API_KEY = "mention-your-Gemini-API-key"
+
+# Story generation scheduler: concurrent Gemini calls and how many may wait
+MAX_IN_FLIGHT_GENERATIONS = 4
+MAX_QUEUED_GENERATIONS = 32
+# gunicorn threads per worker beyond the generation slots above, kept free for
+# login, feedback and the other quick endpoints
+SPARE_REQUEST_THREADS = 8
+
+# Speculative generation: candidates launched at once per round (1 = plain
+# sequential retries) and the cap on Gemini calls spent on one request
+SPECULATIVE_CANDIDATES = 1
+SPECULATIVE_MAX_CALLS = 3
+
+# Story cache: "memory" (per process), "mongo" (shared collection) or None to
+# disable. A key needs STORY_CACHE_VARIANTS stories before it serves hits.
+STORY_CACHE_BACKEND = "memory"
+STORY_CACHE_TTL = 24 * 3600
+STORY_CACHE_MAX_KEYS = 1000
+STORY_CACHE_VARIANTS = 3
+
+# Write-behind buffer for feedback, drift warnings and login logs. When
+# WRITE_BUFFER_MAX_PENDING documents are waiting, "block" waits for a flush
+# and "drop" discards the new document. A batch whose insert fails is retried
+# after WRITE_BUFFER_RETRY_BACKOFF seconds, doubling each time, and dropped
+# after WRITE_BUFFER_MAX_RETRIES failed attempts.
+WRITE_BUFFER_BATCH_SIZE = 100
+WRITE_BUFFER_FLUSH_INTERVAL = 1.0
+WRITE_BUFFER_MAX_PENDING = 10000
+WRITE_BUFFER_FULL_POLICY = "block"
+WRITE_BUFFER_MAX_RETRIES = 5
+WRITE_BUFFER_RETRY_BACKOFF = 1.0
+
+# Login: PBKDF2 iterations for stored password hashes, how long a verified
+# login is remembered in memory and how long session tokens stay valid
+PASSWORD_HASH_ITERATIONS = 200000
+AUTH_CACHE_TTL = 300
+AUTH_CACHE_SIZE = 10000
+SESSION_TOKEN_TTL = 3600
+
+# Drift monitoring: rolling window size per (age, language, genre) segment,
+# PSI above which an aggregated event is written to Drift_events, and whether
+# every out-of-range story is still logged to Drift_warnings
+DRIFT_WINDOW = 500
+DRIFT_MIN_SAMPLES = 100
+DRIFT_EVALUATE_EVERY = 50
+DRIFT_PSI_THRESHOLD = 0.25
+DRIFT_EVENT_COOLDOWN = 3600
+DRIFT_LOG_PER_REQUEST = False
+
+# Server-side narration audio: "stub" (no dependencies), "espeak" (espeak-ng)
+# or "pyttsx3", the on-disk cache for rendered files and the longest text
+# /narration/audio renders in one request
+TTS_ENGINE = "stub"
+TTS_CACHE_DIR = "audio_cache"
+TTS_CACHE_MAX_BYTES = 500 * 1024 * 1024
+TTS_MAX_CHARS = 5000
+
+# Batch generation: items per job, stories packed into one Gemini call, per-job call rate
+# and concurrent calls per job
+BATCH_MAX_ITEMS = 200
+BATCH_PACK_SIZE = 5
+BATCH_CALLS_PER_MINUTE = 60
+BATCH_WORKERS = 4
+# Gemini calls all batch jobs together may run at once; keep it below
+# MAX_IN_FLIGHT_GENERATIONS so interactive requests always get a slot
+BATCH_MAX_IN_FLIGHT = 2
+
+# Tracing: with PROFILE_REQUESTS on, a request sent with an X-Profile header is
+# run under cProfile and the stats are written to PROFILE_DIR/<trace id>.prof
+PROFILE_REQUESTS = False
+PROFILE_DIR = "profiles"
+
+# MongoDB and Gemini. Clients are created per process on first use; the pool
+# size is per worker process.
+MONGO_URI = "mongodb://localhost:27017/"
+MONGO_DB = "story_app"
+MONGO_MAX_POOL_SIZE = 50
+MONGO_TIMEOUT_MS = 3000
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# Prompt variants: the selection written by prompt_ab.py, the variant used for
+# (age band, language) pairs it does not cover, and the share of requests that
+# try another variant so its FRE pass rate keeps being measured
+PROMPT_VARIANTS_FILE = "prompt_variants.json"
+PROMPT_DEFAULT_VARIANT = "full"
+PROMPT_EXPLORE_SHARE = 0.0
@@ -0,0 +1,225 @@
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from story_cache import normalize_field
+
+# Streaming drift monitor. For every (age_range, language, genre) segment it
+# keeps a rolling window of the last `window` observations of each metric as
+# fixed-bin histograms (a ring of bin indexes plus per-bin counts), so an
+# update is O(1) and memory is constant per segment. Quantiles are read off the
+# histogram and the Population Stability Index is computed against a stored
+# baseline histogram. Drift is reported as one aggregated event per segment
+# and metric, at most once per `cooldown` seconds.
+BIN_EDGES = {
+    "latency": [1, 2, 3, 5, 8, 12, 15, 20, 30, 60],
+    "flesch_score": [10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110],
+    "story_length": [200, 300, 400, 500, 600, 800, 1000, 1200, 1500, 2000],
+    "translated_flesch_score": [10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110],
+}
+METRICS = list(BIN_EDGES)
+PSI_EPSILON = 1e-4
+
+
+def bin_index(edges, value):
+    for i, edge in enumerate(edges):
+        if value < edge:
+            return i
+    return len(edges)
+
+
+def population_stability_index(expected, actual):
+    expected_total = sum(expected) or 1
+    actual_total = sum(actual) or 1
+    psi = 0.0
+    for e, a in zip(expected, actual):
+        e = max(e / expected_total, PSI_EPSILON)
+        a = max(a / actual_total, PSI_EPSILON)
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+
+class RollingHistogram:
+    def __init__(self, edges, window):
+        self.edges = edges
+        self.window = window
+        self.counts = [0] * (len(edges) + 1)
+        self.ring = array("B")
+        self.next = 0
+
+    def add(self, value):
+        index = bin_index(self.edges, value)
+        if len(self.ring) < self.window:
+            self.ring.append(index)
+        else:
+            self.counts[self.ring[self.next]] -= 1
+            self.ring[self.next] = index
+            self.next = (self.next + 1) % self.window
+        self.counts[index] += 1
+
+    def size(self):
+        return len(self.ring)
+
+    def quantile(self, q):
+        total = len(self.ring)
+        if not total:
+            return None
+        target = q * total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                low = self.edges[i - 1] if i > 0 else 0
+                high = self.edges[i] if i < len(self.edges) else self.edges[-1] * 2
+                return round(low + (high - low) * (target - seen) / count, 2)
+            seen += count
+        return self.edges[-1]
+
+
+class DriftMonitor:
+    def __init__(self, window=500, min_samples=100, evaluate_every=50, psi_threshold=0.25,
+                 cooldown=3600, max_segments=500, baseline_collection=None, emit=None):
+        self.window = window
+        self.min_samples = min_samples
+        self.evaluate_every = evaluate_every
+        self.psi_threshold = psi_threshold
+        self.cooldown = cooldown
+        self.max_segments = max_segments
+        self.baseline_collection = baseline_collection
+        self.emit = emit
+        self.segments = OrderedDict()
+        self.baselines = {}
+        self.last_psi = {}
+        self.last_event = {}
+        self.events = 0
+        self.lock = threading.Lock()
+        if baseline_collection is not None:
+            for doc in baseline_collection.find():
+                self.baselines[(doc["segment"], doc["metric"])] = doc["counts"]
+
+    def _segment(self, key):
+        segment = self.segments.get(key)
+        if segment is None:
+            segment = {
+                "updates": 0,
+                "histograms": {metric: RollingHistogram(BIN_EDGES[metric], self.window) for metric in METRICS},
+            }
+            self.segments[key] = segment
+            while len(self.segments) > self.max_segments:
+                self.segments.popitem(last=False)
+        self.segments.move_to_end(key)
+        return segment
+
+    def _baseline(self, key, metric):
+        # Fall back to the pooled baseline for the metric when the segment has none
+        return self.baselines.get((key, metric)) or self.baselines.get(("*", metric))
+
+    def set_baseline(self, key, metric, counts):
+        with self.lock:
+            self._set_baseline(key, metric, counts)
+        self._persist([(key, metric, list(counts))])
+
+    def _set_baseline(self, key, metric, counts):
+        # In memory only, under self.lock; callers persist the returned baseline
+        # with _persist after releasing the lock so requests never wait on MongoDB
+        self.baselines[(key, metric)] = list(counts)
+        return key, metric, list(counts)
+
+    def _persist(self, baselines):
+        if self.baseline_collection is None:
+            return
+        for key, metric, counts in baselines:
+            self.baseline_collection.update_one(
+                {"_id": f"{metric}|{key}"},
+                {"$set": {"segment": key, "metric": metric, "counts": counts,
+                          "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+
+    def update(self, segment_key, **values):
+        key = "|".join(normalize_field(part) or "none" for part in segment_key)
+        events = []
+        baselines = []
+        with self.lock:
+            segment = self._segment(key)
+            for metric, value in values.items():
+                segment["histograms"][metric].add(value)
+            segment["updates"] += 1
+            if segment["updates"] % self.evaluate_every == 0:
+                events = self._evaluate(key, segment, baselines)
+            self.events += len(events)
+        self._persist(baselines)
+        if self.emit:
+            for event in events:
+                self.emit(event)
+        return events
+
+    def _evaluate(self, key, segment, baselines):
+        events = []
+        now = time.time()
+        for metric, histogram in segment["histograms"].items():
+            if histogram.size() < self.min_samples:
+                continue
+            baseline = self._baseline(key, metric)
+            if baseline is None:
+                # The first full window of a segment becomes its baseline
+                if histogram.size() >= self.window:
+                    baselines.append(self._set_baseline(key, metric, histogram.counts))
+                continue
+            psi = round(population_stability_index(baseline, histogram.counts), 4)
+            self.last_psi[(key, metric)] = psi
+            if psi < self.psi_threshold or now - self.last_event.get((key, metric), 0) < self.cooldown:
+                continue
+            self.last_event[(key, metric)] = now
+            age_range, language, genre = key.split("|", 2)
+            events.append({
+                "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "age": age_range,
+                "language": language,
+                "genre": genre,
+                "metric": metric,
+                "psi": psi,
+                "threshold": self.psi_threshold,
+                "window_size": histogram.size(),
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "bin_edges": histogram.edges,
+                "window_counts": list(histogram.counts),
+                "baseline_counts": list(baseline),
+            })
+        return events
+
+    def freeze_baselines(self):
+        # Use every segment's current window (and the pooled windows) as the new baseline
+        baselines = []
+        with self.lock:
+            pooled = {metric: [0] * (len(BIN_EDGES[metric]) + 1) for metric in METRICS}
+            frozen = 0
+            for key, segment in self.segments.items():
+                for metric, histogram in segment["histograms"].items():
+                    pooled[metric] = [p + c for p, c in zip(pooled[metric], histogram.counts)]
+                    if histogram.size() >= self.min_samples:
+                        baselines.append(self._set_baseline(key, metric, histogram.counts))
+                        frozen += 1
+            for metric, counts in pooled.items():
+                if sum(counts):
+                    baselines.append(self._set_baseline("*", metric, counts))
+        self._persist(baselines)
+        return frozen
+
+    def snapshot(self):
+        with self.lock:
+            segments = {}
+            for key, segment in self.segments.items():
+                segments[key] = {
+                    metric: {
+                        "samples": histogram.size(),
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "psi": self.last_psi.get((key, metric)),
+                    }
+                    for metric, histogram in segment["histograms"].items()
+                }
+            return {"segments": segments, "events": self.events, "baselines": len(self.baselines)}
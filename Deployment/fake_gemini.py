@@ -0,0 +1,127 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+import readability
+from prompts import get_flesch_band, parse_story
+from tracing import estimate_tokens
+
+# Stand-in for genai.GenerativeModel for local load tests: sleeps like a slow
+# Gemini call and then returns a canned story.
+SAMPLE_STORY = """Title: Riya and the Lost Kite
+Riya had a beautiful red kite that her grandmother made for her birthday. One windy afternoon the kite slipped out of her hands and floated away over the village park.
+It finally got stuck in the branches of a tall mango tree. Riya felt very sad and started crying near the tree.
+Her friend Arun came running with a long bamboo stick. They tried again and again, but the kite would not come down.
+Then a curious little monkey watched them from a nearby wall. It climbed the tree quickly, pulled the kite free, and gently dropped it into Riya's hands.
+Riya smiled and shared her bananas with the clever monkey. Now the three friends fly the kite together every evening.
+Moral: Kindness and good friends help us solve our problems."""
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    def __init__(self, outputs=None, latency=1.0, jitter=0.0, chunk_words=8, seed=None):
+        self.outputs = itertools.cycle(outputs or [SAMPLE_STORY])
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_words = chunk_words
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self):
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        self.calls += 1
+        text = next(self.outputs)
+        usage = UsageMetadata(estimate_tokens(str(prompt)), estimate_tokens(text))
+        if stream:
+            return self._stream(text, self._delay(), usage)
+        time.sleep(self._delay())
+        return FakeResponse(text, usage)
+
+    def _stream(self, text, delay, usage):
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+        for i, chunk in enumerate(chunks):
+            time.sleep(delay / len(chunks))
+            last = i == len(chunks) - 1
+            yield FakeResponse(chunk if last else chunk + " ", usage if last else None)
+
+
+def latency_sampler(spec):
+    # "fixed:1.5", "uniform:0.5,3", "normal:2,0.5" or "lognormal:0.5,0.4"
+    # (mu and sigma of the log); returns a function of a random.Random
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def load_recorded(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayGenerativeModel(FakeGenerativeModel):
+    # Replays recorded Gemini outputs (JSON lines with age_range, language and
+    # text). Each call sleeps for a latency drawn from `latency` and, with
+    # probability `pass_rate`, returns an output whose FRE lies inside the band
+    # the prompt asks for, otherwise one outside it, so retries and speculation
+    # behave as they would against Gemini. Draws come from one seeded generator.
+    AGE_PATTERN = re.compile(r"aged (\d+-\d+|\d+\+)")
+
+    def __init__(self, records, latency="fixed:1.0", pass_rate=0.8, chunk_words=8, seed=0):
+        self.records = records
+        self.sample_latency = latency_sampler(latency)
+        self.pass_rate = pass_rate
+        self.chunk_words = chunk_words
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.passes = 0
+        for record in records:
+            body = parse_story(record["text"], record.get("language", ""))["story_body"]
+            record["fre"] = readability.flesch_reading_ease(body) if body else 0
+
+    def _pick(self, prompt):
+        match = self.AGE_PATTERN.search(str(prompt))
+        score_min, score_max = get_flesch_band(match.group(1) if match else "")
+        with self.lock:
+            self.calls += 1
+            want_pass = self.random.random() < self.pass_rate
+            inside = [r for r in self.records if score_min <= r["fre"] <= score_max]
+            outside = [r for r in self.records if not score_min <= r["fre"] <= score_max]
+            pool = (inside if want_pass else outside) or self.records
+            record = self.random.choice(pool)
+            self.passes += record in inside
+            return record["text"], self.sample_latency(self.random)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        text, delay = self._pick(prompt)
+        usage = UsageMetadata(estimate_tokens(str(prompt)), estimate_tokens(text))
+        if stream:
+            return self._stream(text, delay, usage)
+        time.sleep(delay)
+        return FakeResponse(text, usage)
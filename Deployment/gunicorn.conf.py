@@ -0,0 +1,38 @@
+# gunicorn settings for wsgi:app. Every worker builds its own MongoDB client,
+# Gemini model, write buffer and generation scheduler on first use, so
+# MAX_IN_FLIGHT_GENERATIONS and MONGO_MAX_POOL_SIZE apply per worker.
+import multiprocessing
+import os
+import threading
+
+import config as story_config
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Requests mostly wait on Gemini, so each worker serves several at once. Every
+# running or queued generation holds a thread, so there must be more threads
+# than generation slots: otherwise the scheduler queue never fills, its 429s
+# never fire and quick endpoints wait behind stories again
+worker_class = "gthread"
+threads = int(os.environ.get(
+    "GUNICORN_THREADS",
+    story_config.MAX_IN_FLIGHT_GENERATIONS + story_config.MAX_QUEUED_GENERATIONS + story_config.SPARE_REQUEST_THREADS
+))
+# A story with retries can take several Gemini calls
+timeout = 120
+graceful_timeout = 30
+# Import the app once in the master; workers fork with the code loaded and
+# nothing connected
+preload_app = True
+
+
+def post_worker_init(worker):
+    # Connect in the background so the worker serves /healthz immediately and
+    # /readyz turns ready without waiting for the first request
+    import app
+    threading.Thread(target=app.warm_up, name="warm-up", daemon=True).start()
+
+
+def worker_exit(server, worker):
+    import app
+    app.close_services()
@@ -0,0 +1,40 @@
+import os
+import threading
+
+
+class ProcessLocal:
+    # Stands in for an object that is built on first use in each process.
+    # Importing the app then does no network I/O and starts no threads. A
+    # forked worker (gunicorn) builds its own MongoDB client, write buffer and
+    # scheduler instead of inheriting the parent's, which are not fork-safe.
+    # Attribute access, indexing and truthiness are forwarded to the object.
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "object")
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self._factory()
+                    self._pid = pid
+        return self._value
+
+    def built(self):
+        return self._pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __getitem__(self, key):
+        return self.get()[key]
+
+    def __bool__(self):
+        return bool(self.get())
+
+    def __repr__(self):
+        return f"<ProcessLocal {self._name}{'' if self.built() else ' (not built)'}>"
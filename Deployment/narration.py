@@ -0,0 +1,119 @@
+import re
+
+# Splits story text into narration chunks for speechSynthesis on the client.
+# Each chunk carries its BCP-47 language code, word count, an estimated
+# duration and its start offset, so the client can start speaking the first
+# chunk immediately and queue the rest.
+
+# Same codes as languageSpeechMap in the frontend
+SPEECH_LANGS = {
+    "none": "en-GB",
+    "english": "en-GB",
+    "hindi": "hi-IN",
+    "telugu": "te-IN",
+    "tamil": "ta-IN",
+    "kannada": "kn-IN",
+    "marathi": "mr-IN",
+    "bengali": "bn-IN",
+    "french": "fr-FR",
+}
+
+# Approximate speaking rates (words per minute at utterance.rate 1.0). Indic
+# words are longer on average, so fewer are spoken per minute.
+WORDS_PER_MINUTE = {
+    "en-GB": 170,
+    "fr-FR": 165,
+    "hi-IN": 140,
+    "mr-IN": 125,
+    "bn-IN": 130,
+    "te-IN": 115,
+    "ta-IN": 110,
+    "kn-IN": 115,
+}
+
+# Sentence ends: Latin punctuation, the Devanagari/Bengali danda and double
+# danda, and CJK-style full stops some models emit. Closing quotes stay with
+# their sentence.
+SENTENCE_END_RE = re.compile(r"(?<=[.!?।॥。！？])[\"'”’)\]]*\s+|\n+")
+WORD_RE = re.compile(r"\S+")
+
+# utterance.rate and pause lengths used by App.js
+ENGLISH_RATE = 0.85
+TRANSLATED_RATE = 1.0
+ENGLISH_PAUSE = 1.0
+TRANSLATED_PAUSE = 0.5
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_END_RE.split(text or "") if sentence.strip()]
+
+
+def group_sentences(sentences, max_chars):
+    # The first sentence is its own chunk so speech starts as early as possible;
+    # after that short sentences are merged up to max_chars.
+    chunks = []
+    for sentence in sentences:
+        if len(chunks) > 1 and len(chunks[-1]) + len(sentence) + 1 <= max_chars:
+            chunks[-1] += " " + sentence
+        else:
+            chunks.append(sentence)
+    return chunks
+
+
+def segment_sections(sections, lang, rate, pause, max_chars=220):
+    # sections: list of (section name, text) spoken in order with a pause between them
+    wpm = WORDS_PER_MINUTE.get(lang, 150) * rate
+    segments = []
+    start = 0.0
+    sections = [(name, text) for name, text in sections if text and text.strip()]
+    for position, (name, text) in enumerate(sections):
+        chunks = group_sentences(split_sentences(text), max_chars)
+        for i, chunk in enumerate(chunks):
+            words = len(WORD_RE.findall(chunk))
+            duration = round(words / wpm * 60, 2)
+            last_in_section = i == len(chunks) - 1 and position < len(sections) - 1
+            segments.append({
+                "index": len(segments),
+                "section": name,
+                "lang": lang,
+                "text": chunk,
+                "words": words,
+                "est_duration_sec": duration,
+                "start_sec": round(start, 2),
+                "pause_after_sec": pause if last_in_section else 0,
+            })
+            start += duration + (pause if last_in_section else 0)
+    return segments
+
+
+def build_narration(title, story_body, moral, language="", translated_title="", translated_story="", translated_moral="",
+                    labels=None, max_chars=220):
+    english = segment_sections(
+        [("title", f"Title: {title}" if title else ""), ("story", story_body), ("moral", f"Moral: {moral}" if moral else "")],
+        SPEECH_LANGS["none"], ENGLISH_RATE, ENGLISH_PAUSE, max_chars
+    )
+    translated = []
+    lang_key = language.lower() if language else "none"
+    if lang_key != "none":
+        labels = labels or {"title": "Title", "moral": "Moral"}
+        translated = segment_sections(
+            [
+                ("title", f"{labels['title']}: {translated_title}" if translated_title else ""),
+                ("story", translated_story),
+                ("moral", f"{labels['moral']}: {translated_moral}" if translated_moral else ""),
+            ],
+            SPEECH_LANGS.get(lang_key, SPEECH_LANGS["none"]), TRANSLATED_RATE, TRANSLATED_PAUSE, max_chars
+        )
+    return {
+        "english": english,
+        "translated": translated,
+        "english_duration_sec": total_duration(english),
+        "translated_duration_sec": total_duration(translated),
+    }
+
+
+def total_duration(segments):
+    if not segments:
+        return 0
+    last = segments[-1]
+    return round(last["start_sec"] + last["est_duration_sec"], 2)
@@ -0,0 +1,225 @@
+# Incremental export of the analytics collections for the Power BI dashboard.
+#
+#   cd Deployment
+#   python pbi_export.py --out pbi_export
+#   python pbi_export.py --collection Drift_warnings --watermark datetime
+#
+# Each run reads only the documents stored since the previous run (tracked by a
+# watermark in <out>/_watermarks.json), streams them in batches with a
+# projection of the dashboard columns (the story texts are never loaded), and
+# writes them as a new Parquet part file in <out>/<collection>/, which Power BI
+# reads as a folder. Without pyarrow the rows are appended to <out>/<collection>.csv
+# instead. The daily rollup tables are small and are rewritten in full each run.
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from analytics import Rollups, as_number
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Dashboard columns per collection; anything not listed (story, translated story) is not read
+EXPORT_COLUMNS = {
+    "feedback": ["_id", "datetime", "age", "genre", "theme", "main_characters", "language", "title",
+                 "rating", "feedback", "latency", "flesch_score", "story_length", "psi", "warning"],
+    "Drift_warnings": ["_id", "datetime", "age", "genre", "theme", "language", "title", "speed",
+                       "flesch_score", "story_length", "psi", "warning"],
+    "Drift_events": ["_id", "datetime", "age", "language", "genre", "metric", "psi", "threshold",
+                     "window_size", "p50", "p95"],
+    "login_logs": ["_id", "datetime", "user_id", "username", "device_type"],
+}
+NUMERIC_COLUMNS = {"rating", "latency", "flesch_score", "story_length", "psi", "speed",
+                   "threshold", "window_size", "p50", "p95"}
+
+
+def to_cell(column, value):
+    if value is None:
+        return None
+    if column in NUMERIC_COLUMNS:
+        return as_number(value)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(map(str, value))
+    return str(value)
+
+
+class Watermarks:
+    def __init__(self, path):
+        self.path = path
+        self.marks = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.marks = json.load(f)
+
+    def get(self, collection):
+        return self.marks.get(collection)
+
+    def set(self, collection, mark):
+        self.marks[collection] = mark
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.marks, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def incremental_query(mark, field):
+    # Documents after the watermark. With a datetime watermark several documents
+    # share one second, so _id breaks the tie.
+    if not mark:
+        return {}
+    last_id = ObjectId(mark["_id"])
+    if field == "_id":
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [{field: {"$gt": mark[field]}}, {field: mark[field], "_id": {"$gt": last_id}}]}
+
+
+def iter_batches(collection, columns, mark, field, batch_size):
+    sort = [("_id", 1)] if field == "_id" else [(field, 1), ("_id", 1)]
+    cursor = collection.find(incremental_query(mark, field), {column: 1 for column in columns})
+    batch = []
+    for doc in cursor.sort(sort).batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ParquetPart:
+    def __init__(self, directory, columns):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"part-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.parquet")
+        self.schema = pa.schema([(c, pa.float64() if c in NUMERIC_COLUMNS else pa.string()) for c in columns])
+        self.writer = pq.ParquetWriter(self.path + ".tmp", self.schema)
+
+    def write(self, rows):
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+class CsvAppender:
+    def __init__(self, path, columns):
+        new = not os.path.exists(path)
+        self.path = path
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=columns)
+        if new:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def export_collection(db, name, out_dir, watermarks, field="_id", batch_size=1000, fmt="parquet"):
+    columns = EXPORT_COLUMNS[name]
+    mark = watermarks.get(name)
+    if mark and mark.get("field", "_id") != field:
+        raise ValueError(f"{name} was exported by {mark.get('field')}; keep the same watermark field")
+    sink = None
+    exported = 0
+    for batch in iter_batches(db[name], columns, mark, field, batch_size):
+        if sink is None:
+            if fmt == "parquet":
+                sink = ParquetPart(os.path.join(out_dir, name), columns)
+            else:
+                sink = CsvAppender(os.path.join(out_dir, f"{name}.csv"), columns)
+        sink.write([{column: to_cell(column, doc.get(column)) for column in columns} for doc in batch])
+        exported += len(batch)
+        last = batch[-1]
+        mark = {"field": field, "_id": str(last["_id"]), "exported": (mark or {}).get("exported", 0) + len(batch)}
+        if field != "_id":
+            mark[field] = last.get(field)
+        if fmt == "csv":
+            # Appended rows are already on disk, so the watermark can move per batch
+            watermarks.set(name, mark)
+    if sink is not None:
+        sink.close()
+        watermarks.set(name, mark)
+    return exported
+
+
+def write_table(rows, path, fmt):
+    columns = sorted({key for row in rows for key in row})
+    if fmt == "parquet":
+        pq.write_table(pa.table({column: [row.get(column) for row in rows] for column in columns}), path + ".parquet")
+        return
+    with open(path + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def flatten(doc, prefix=""):
+    row = {}
+    for key, value in doc.items():
+        if isinstance(value, dict):
+            row.update(flatten(value, f"{prefix}{key}_"))
+        else:
+            row[f"{prefix}{key}"] = value
+    return row
+
+
+def export_rollups(db, out_dir, fmt="parquet"):
+    rollups = Rollups(db)
+    ratings = []
+    for doc in rollups.daily("daily_ratings"):
+        row = flatten(doc)
+        row["avg_rating"] = round(doc["rating_sum"] / doc["rated"], 2) if doc.get("rated") else None
+        ratings.append(row)
+    tables = {
+        "daily_ratings": ratings,
+        "daily_latency": rollups.latency_summary(),
+        "daily_drift": [flatten(doc) for doc in rollups.daily("daily_drift")],
+    }
+    for name, rows in tables.items():
+        if rows:
+            write_table(rows, os.path.join(out_dir, name), fmt)
+    return {name: len(rows) for name, rows in tables.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="story_app")
+    parser.add_argument("--collection", action="append", choices=sorted(EXPORT_COLUMNS),
+                        help="collection to export (repeatable, default: feedback)")
+    parser.add_argument("--out", default="pbi_export", help="output directory")
+    parser.add_argument("--watermark", default="_id", choices=["_id", "datetime"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet" if pa else "csv")
+    parser.add_argument("--skip-rollups", action="store_true")
+    args = parser.parse_args()
+    if args.format == "parquet" and pa is None:
+        parser.error("parquet output needs pyarrow (pip install pyarrow) or use --format csv")
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    os.makedirs(args.out, exist_ok=True)
+    watermarks = Watermarks(os.path.join(args.out, "_watermarks.json"))
+    for name in args.collection or ["feedback"]:
+        exported = export_collection(db, name, args.out, watermarks, field=args.watermark,
+                                     batch_size=args.batch_size, fmt=args.format)
+        print(f"{name}: {exported} new documents", file=sys.stderr)
+    if not args.skip_rollups:
+        for name, count in export_rollups(db, args.out, args.format).items():
+            print(f"{name}: {count} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
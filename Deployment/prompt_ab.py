@@ -0,0 +1,162 @@
+# Offline A/B evaluation of prompt variants.
+#
+#   cd Deployment
+#   python prompt_ab.py --tokens                 # template tokens per variant, age band and language
+#   python prompt_ab.py --since 2026-01-01       # evaluate recorded pass rates and write the selection
+#   python prompt_ab.py --outcomes outcomes.jsonl --dry-run
+#
+# Pass rates come from the prompt_variant_stats rollup (or a JSON lines export
+# of prompt_outcomes documents). The app records them for every generation;
+# set PROMPT_EXPLORE_SHARE above 0 so the variants that are not selected get
+# traffic too. For each (age band, language) a variant is eligible when it has
+# at least --min-checks band checks and its pass rate is at least the default
+# variant's (less an explicit --tolerance), so retries do not go up. Among the
+# eligible ones the best pass rate per template token wins. The choice is
+# written to PROMPT_VARIANTS_FILE with its token count and pass rate; the app
+# loads it at startup.
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import MongoClient
+
+import config
+from prompt_variants import VARIANTS, token_table
+from prompts import AGE_BANDS, AGE_BAND_ALIASES, label_map
+from story_cache import normalize_field
+
+
+def load_stats(db, since=None):
+    query = {"day": {"$gte": since}} if since else {}
+    return list(db["prompt_variant_stats"].find(query))
+
+
+def load_outcomes(path, since=None):
+    # Raw prompt_outcomes documents, summed the way the rollup does
+    stats = defaultdict(lambda: defaultdict(int))
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            if since and str(doc.get("datetime", ""))[:10] < since:
+                continue
+            row = stats[(doc["variant"], doc["age_range"], normalize_field(doc.get("language")) or "none")]
+            row["requests"] += 1
+            row["checks"] += doc.get("checks", 0)
+            row["passes"] += doc.get("passes", 0)
+    return [{"variant": v, "age_range": a, "language": l, **row} for (v, a, l), row in stats.items()]
+
+
+def summarize(rows):
+    totals = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        age_range = AGE_BAND_ALIASES.get(row["age_range"], row["age_range"])
+        key = (row["variant"], age_range, row["language"])
+        for field in ("requests", "checks", "passes"):
+            totals[key][field] += row.get(field, 0)
+    return totals
+
+
+def expected_calls(pass_rate, max_attempts=3):
+    # Gemini calls per request when each attempt passes with pass_rate
+    return sum((1 - pass_rate) ** k for k in range(max_attempts))
+
+
+def evaluate(totals, tokens, default="full", min_checks=30, tolerance=0.0):
+    selected = []
+    for age_range in AGE_BANDS:
+        for language in ["none", *label_map]:
+            candidates = []
+            # Unrounded pass rates, so a variant a fraction of a point worse is not eligible
+            rates = {}
+            for variant in VARIANTS:
+                stats = totals.get((variant, age_range, language))
+                if not stats or not stats["checks"]:
+                    continue
+                pass_rate = rates[variant] = stats["passes"] / stats["checks"]
+                template_tokens = tokens[(variant, age_range, language)]
+                candidates.append({
+                    "variant": variant,
+                    "checks": stats["checks"],
+                    "pass_rate": round(pass_rate, 3),
+                    "tokens": template_tokens,
+                    "pass_rate_per_1k_tokens": round(pass_rate / template_tokens * 1000, 3),
+                    "expected_input_tokens": round(template_tokens * expected_calls(pass_rate)),
+                })
+            baseline = next((c for c in candidates if c["variant"] == default), None)
+
+            eligible = [
+                c for c in candidates
+                if c["variant"] == default or (
+                    baseline and c["checks"] >= min_checks and baseline["checks"] >= min_checks
+                    and rates[c["variant"]] >= rates[default] - tolerance
+                )
+            ]
+            best = max(eligible, key=lambda c: c["pass_rate_per_1k_tokens"], default=None)
+            selected.append({
+                "age_range": age_range,
+                "language": language,
+                "variant": best["variant"] if best else default,
+                "tokens": best["tokens"] if best else tokens[(default, age_range, language)],
+                "pass_rate": best["pass_rate"] if best else None,
+                "baseline_tokens": tokens[(default, age_range, language)],
+                "baseline_pass_rate": baseline["pass_rate"] if baseline else None,
+                "candidates": candidates,
+            })
+    return selected
+
+
+def print_tokens(tokens):
+    variants = list(VARIANTS)
+    print(f"{'age':6} {'language':9} " + " ".join(f"{v:>8}" for v in variants))
+    for age_range in AGE_BANDS:
+        for language in ["none", *label_map]:
+            print(f"{age_range:6} {language:9} " + " ".join(f"{tokens[(v, age_range, language)]:>8}" for v in variants))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", action="store_true", help="only print template tokens per variant")
+    parser.add_argument("--outcomes", help="JSON lines of prompt_outcomes documents instead of MongoDB")
+    parser.add_argument("--since", help="only use outcomes from this day on (YYYY-MM-DD)")
+    parser.add_argument("--min-checks", type=int, default=30, help="band checks a variant needs to be eligible")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="allowed pass rate drop against the default (opt-in; raises retries)")
+    parser.add_argument("--out", default=config.PROMPT_VARIANTS_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="print the choice without writing it")
+    args = parser.parse_args()
+
+    tokens = token_table()
+    if args.tokens:
+        print_tokens(tokens)
+        return
+
+    if args.outcomes:
+        rows = load_outcomes(args.outcomes, args.since)
+    else:
+        rows = load_stats(MongoClient(config.MONGO_URI)[config.MONGO_DB], args.since)
+    selected = evaluate(summarize(rows), tokens, config.PROMPT_DEFAULT_VARIANT, args.min_checks, args.tolerance)
+
+    for entry in selected:
+        change = ""
+        if entry["variant"] != config.PROMPT_DEFAULT_VARIANT:
+            change = (f"  tokens {entry['baseline_tokens']} -> {entry['tokens']}, "
+                      f"pass rate {entry['baseline_pass_rate']} -> {entry['pass_rate']}")
+        print(f"{entry['age_range']:6} {entry['language']:9} {entry['variant']:8}{change}", file=sys.stderr)
+    if args.dry_run:
+        return
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({
+            "generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "since": args.since,
+            "default": config.PROMPT_DEFAULT_VARIANT,
+            "selected": selected,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"wrote {args.out}; restart the app to use it", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import os
+import random
+from functools import lru_cache
+
+from prompts import (AGE_BANDS, AGE_BAND_ALIASES, DEFAULT_LABELS, escape_braces, fill_template, get_flesch_band,
+                     label_map, language_notes)
+from prompts import prompt_template as full_prompt_template
+from tracing import estimate_tokens
+
+# Prompt variants. Every variant compiles a template per (age band, language)
+# like prompts.compile_template; "full" is that original prompt, served from
+# the templates prompts.py builds at startup, the others say the same with
+# fewer tokens. Which variant serves each (age band, language)
+# is decided offline by prompt_ab.py from recorded pass rates and stored in
+# the selection file; pairs without a selection use the default variant.
+VARIANTS = {}
+
+
+@lru_cache(maxsize=1024)
+def prompt_template(variant, age_range, language):
+    return VARIANTS[variant](age_range, language)
+
+
+def register_variant(name, compile):
+    VARIANTS[name] = compile
+    prompt_template.cache_clear()
+
+
+COMPACT_PROMPT = """Write an imaginative, age-appropriate story for Indian children aged {age_range}.
+- Genre: {genre}
+- Main characters: {characters}
+- Theme: {theme}
+- At most 350 words, in English only.
+- Its Flesch Reading Ease (FRE) score MUST be between {score_min} and {score_max}; rewrite it until it is.{style}
+Format exactly:
+Title: [title]
+[story]
+Moral: [moral]
+"""
+
+COMPACT_STYLE = {
+    "3-8": "Use everyday words and medium sentences of 6-9 words, for a child just learning to read.",
+    "9-15": "Use simple, clear words and sentences of 10-14 words for a student aged 9 to 15; no academic words.",
+    "16-19": "Use clear language with some moderately advanced words and sentences of 10-16 words.",
+    "20+": "Use advanced vocabulary and complex sentence structures for adults; aim for an FRE of 40-45.",
+}
+
+COMPACT_TRANSLATION = """
+Then translate only the story and moral into natural, child-friendly {language} at the same reading level, with no English except proper nouns, using exactly:
+{title}: [translated title]
+{story}: [translated story]
+{moral}: [translated moral]
+"""
+
+
+def compile_compact(age_range, language, style=True, note=True):
+    score_min, score_max = get_flesch_band(age_range)
+    band_style = COMPACT_STYLE.get(AGE_BAND_ALIASES.get(age_range, age_range)) if style else None
+    template = COMPACT_PROMPT.format(
+        age_range=escape_braces(age_range),
+        score_min=score_min,
+        score_max=score_max,
+        style=f"\n- {band_style}" if band_style else "",
+        genre="{genre}",
+        characters="{characters}",
+        theme="{theme}"
+    )
+    if language and language.lower() != "none":
+        lang_key = language.lower()
+        labels = label_map.get(lang_key, DEFAULT_LABELS)
+        template += escape_braces(COMPACT_TRANSLATION.format(language=language, **labels))
+        if note and lang_key in language_notes:
+            template += escape_braces(language_notes[lang_key].replace("Note: ", "") + "\n")
+    return template
+
+
+register_variant("full", full_prompt_template)
+register_variant("compact", compile_compact)
+register_variant("minimal", lambda age_range, language: compile_compact(age_range, language, style=False, note=False))
+
+
+def token_table(count_tokens=estimate_tokens):
+    # Template tokens per (variant, age band, language); genre, characters and
+    # theme add the same handful of tokens to every variant
+    return {
+        (variant, age_range, language): count_tokens(prompt_template(variant, age_range, language))
+        for variant in VARIANTS
+        for age_range in AGE_BANDS
+        for language in ["none", *label_map]
+    }
+
+
+class VariantSelector:
+    # Serves the selected variant for each (age band, language). With
+    # `explore` > 0 that share of requests gets a random other variant, so
+    # pass rates for the alternatives keep being recorded (the A/B arm).
+    def __init__(self, path=None, default="full", explore=0.0, seed=None):
+        self.default = default
+        self.explore = explore
+        self.random = random.Random(seed)
+        self.selected = {}
+        self.tokens = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for entry in json.load(f)["selected"]:
+                    if entry["variant"] in VARIANTS:
+                        self.selected[(entry["age_range"], entry["language"])] = entry["variant"]
+
+    def key(self, age_range, language):
+        language = (language or "none").lower()
+        return AGE_BAND_ALIASES.get(age_range, age_range), language
+
+    def choose(self, age_range, language):
+        variant = self.selected.get(self.key(age_range, language), self.default)
+        if self.explore and len(VARIANTS) > 1 and self.random.random() < self.explore:
+            variant = self.random.choice([name for name in VARIANTS if name != variant])
+        return variant
+
+    def build_prompt(self, age_range, genre, theme, characters, language):
+        variant = self.choose(age_range, language)
+        template = prompt_template(variant, age_range, language or "")
+        return variant, fill_template(template, genre, theme, characters)
+
+    def template_tokens(self, variant, age_range, language):
+        key = (variant, age_range, language)
+        if key not in self.tokens:
+            self.tokens[key] = estimate_tokens(prompt_template(variant, age_range, language))
+        return self.tokens[key]
+
+    def report(self):
+        # Selected variant and its template tokens for every known pair
+        rows = []
+        for age_range in AGE_BANDS:
+            for language in ["none", *label_map]:
+                variant = self.selected.get((age_range, language), self.default)
+                rows.append({
+                    "age_range": age_range,
+                    "language": language,
+                    "variant": variant,
+                    "tokens": self.template_tokens(variant, age_range, language),
+                })
+        return rows
@@ -0,0 +1,264 @@
+import re
+from functools import lru_cache
+from string import Formatter
+
+# Prompt templates and the response parser used by generate_story.
+# Templates for every (age band, language) pair offered by the frontend are
+# built once at import; a request only fills in genre, characters and theme.
+
+# Flesch score mapping
+flesch_map = {
+    "3-8": (80, 100),
+    "9-15": (60, 80),
+    "16-19": (50, 60),
+    "20+": (30, 50),
+}
+
+def get_flesch_band(age_range):
+    score_min, score_max = 30, 100  # default
+    for k, (minv, maxv) in flesch_map.items():
+        if "-" in k and "-" in age_range:
+            k_start, k_end = map(int, k.split("-"))
+            a_start, a_end = map(int, age_range.split("-"))
+            if a_start >= k_start and a_end <= k_end:
+                score_min, score_max = minv, maxv
+                break
+        elif "+" in k and "+" in age_range:
+            score_min, score_max = flesch_map[k]
+            break
+    return score_min, score_max
+
+language_notes = {
+    "telugu": "Note: Use common Telugu words spoken in Andhra Pradesh and Telangana regions. Avoid Sanskritized or literary Telugu unless necessary.",
+    "hindi": "Note: Use conversational Hindi understood by children in North India. Avoid very formal or Urdu-heavy vocabulary.",
+    "french": "Note: Use simple, conversational French as spoken by children in France. Avoid overly formal or academic language.",
+    "tamil": "Note: Use everyday spoken Tamil familiar to children in Tamil Nadu. Avoid highly literary or classical Tamil.",
+    "kannada": "Note: Use conversational Kannada as spoken by children in Karnataka. Avoid archaic or highly formal words.",
+    "marathi": "Note: Use simple, conversational Marathi as spoken by children in Maharashtra. Avoid overly formal or Sanskritized words.",
+    "bengali": "Note: Use everyday Bengali as spoken by children in West Bengal. Avoid highly literary or archaic words.",
+    # Add more languages as needed
+}
+
+label_map = {
+    "telugu": {"title": "శీర్షిక", "story": "కథ", "moral": "నీతి"},
+    "hindi": {"title": "शीर्षक", "story": "कहानी", "moral": "नीति"},
+    "french": {"title": "Titre", "story": "Histoire", "moral": "Morale"},
+    "tamil": {"title": "தலைப்பு", "story": "கதை", "moral": "நீதிக்கதை"},
+    "kannada": {"title": "ಶೀರ್ಷಿಕೆ", "story": "ಕಥೆ", "moral": "ನೀತಿ"},
+    "marathi": {"title": "शीर्षक", "story": "कथा", "moral": "नीती"},
+    "bengali": {"title": "শিরোনাম", "story": "গল্প", "moral": "নৈতিকতা"},
+    # Add more languages as needed
+}
+
+DEFAULT_LABELS = {"title": "Title", "story": "Story", "moral": "Moral"}
+AGE_BANDS = ["3-8", "9-15", "16-19", "20+"]
+AGE_BAND_ALIASES = {"3-5": "3-8"}
+
+BASE_PROMPT = """
+    Write an imaginative and age-appropriate story for Indian children aged {age_range}.
+
+    Requirements:
+    - Genre: {genre}
+    - Main Characters: {characters}
+    - Theme: {theme}
+    - Story Length: Maximum 350 words.
+    - Use simple, clear English vocabulary and sentence structure that is suitable for children aged {age_range}.
+    - The story MUST be written so that its Flesch Reading Ease (FRE) score is between {flesch_score}. 
+    - The Flesch score requirement applies ONLY to the English story.
+    - DO NOT include any translation, non-English words, or translation labels in the English story section.
+    - Avoid complex words and long sentences for younger ages; use more advanced language for older ages.
+    - Include a catchy, relevant title at the beginning.
+    - End with a moral in the format: Moral: [your moral]
+    - **Do NOT add any label like 'English Story:' or similar. Only use 'Title:', the story text, and 'Moral:' as shown below.**
+
+    Format:
+    Title: [Your title]
+    [Story text]
+    Moral: [your moral]
+    """
+
+# Extra rules appended for each age band
+AGE_BAND_RULES = {
+    "3-8": (
+        "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 80 and 100."
+        "\n- Use normal words and keep medium sentences (6-9 words each)."
+        "\n- Avoid any very easy or very complex vocabulary."
+        "\n- Imagine you are writing for a 3–8 year old who is just learning to read."
+        "\n- If the story is  very easy or more difficult, REWRITE it until it fits the FRE score range."
+        "\n- Do NOT write a story that is outside this FRE score range."
+        "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+    ),
+    "9-15": (
+        "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 60 and 80."
+        "\n- The FRE score must NEVER be above 80 or below 60 for this age group."
+        "\n- Use simple and clear words."
+        "\n- Keep sentences short (10–14 words) and easy to understand."
+        "\n- Avoid difficult vocabulary and long sentences."
+        "\n- Do not use advanced or academic words."
+        "\n- Imagine you are writing for a school student aged 9 to 15."
+        "\n- If the story is too easy or too hard, or if the FRE score is outside 60–80, REWRITE it until it fits the FRE score range."
+        "\n- You absolutely MUST NOT write a story with a Flesch score above 80 or below 60."
+        "\n- Do NOT write a story that is outside this FRE score range."
+        "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+        "\n- EVEN WHEN TRANSLATING TO ANOTHER LANGUAGE, NEVER GO OUTSIDE THE FRE SCORE RANGE OF 60–80."
+        "\n- Repeat: The story (and any translation) MUST have a Flesch Reading Ease (FRE) score between 60 and 80."
+    ),
+    "16-19": (
+        "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 50 and 60."
+        "\n- Use clear language with some moderately advanced vocabulary."
+        "\n- Keep most sentences between 10 and 16 words."
+        "\n- Mix simple and moderately complex sentences, but avoid very long or academic sentences."
+        "\n- Do not use too many advanced words."
+        "\n- Write as you would for a high school student aged 16 to 19."
+        "\n- If the story is too easy or too hard, REWRITE it until it fits the FRE score range."
+        "\n- Do NOT write a story that is outside this FRE score range."
+        "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+    ),
+    "20+": (
+        "\n- IMPORTANT: The story MUST have a Flesch Reading Ease (FRE) score between 30 and 50."
+        "\n- Aim for a FRE score between 40 and 45. Do NOT write a story with a FRE score below 35 or above 45."
+        "\n- Use advanced vocabulary, medium sentences, and  complex sentence structures."
+        "\n- Do not simplify the language. Write as you would for college students or adults."
+        "\n- If the story is very too easy (FRE > 50) or very too hard (FRE < 30), REWRITE it until it fits the FRE score range."
+        "\n- Do NOT write a story that is outside this FRE score range."
+        "\n- If you cannot write a story within this FRE range, DO NOT RETURN ANY STORY."
+        "\n- If you do not follow the FRE rule, your answer will be rejected and regenerated."
+    ),
+}
+
+TRANSLATION_PROMPT = """
+
+After you have finished the English story above, translate ONLY the English story and its moral into {language} for Indian children.
+
+**Translation Instructions:**
+- Do NOT translate word-for-word. Use natural, fluent, and child-friendly {language} as used in everyday conversation.
+- Ensure the translated story is easy for children in the target age group to understand.
+- Use age-appropriate vocabulary and grammar for {language}.
+- Do NOT include any English words unless they are proper nouns.
+- Write ONLY the translated version, using these labels (translated in {language}):
+    - {title}: [Translated title]
+    - {story}: [Translated story]
+    - {moral}: [Translated moral]
+- DO NOT repeat the English story or moral.
+- DO NOT include any English text in this section (except proper nouns).
+- Structure:
+    {title}: [Translated title]
+    {story}: [Translated story]
+    {moral}: [Translated moral]
+- Even when translating to {language}, ensure the story would have a Flesch Reading Ease (FRE) score in the same range as required for English. Do NOT make the translation easier or harder than the English version. Do NOT go outside the FRE range for the selected age group, even in translation.
+"""
+
+
+def escape_braces(value):
+    return str(value).replace("{", "{{").replace("}", "}}")
+
+def compile_template(age_range, language):
+    score_min, score_max = get_flesch_band(age_range)
+    template = BASE_PROMPT.format(
+        age_range=escape_braces(age_range),
+        flesch_score=f"{score_min}–{score_max}",
+        genre="{genre}",
+        characters="{characters}",
+        theme="{theme}"
+    )
+    template += AGE_BAND_RULES.get(AGE_BAND_ALIASES.get(age_range, age_range), "")
+    if language and language.lower() != "none":
+        lang_key = language.lower()
+        labels = label_map.get(lang_key, DEFAULT_LABELS)
+        template += escape_braces(TRANSLATION_PROMPT.format(language=language, **labels))
+        # Add language-specific note if available
+        if lang_key in language_notes:
+            template += escape_braces(f"\n{language_notes[lang_key]}")
+    return template
+
+PROMPT_TEMPLATES = {
+    (age_range, language): compile_template(age_range, language)
+    for age_range in AGE_BANDS
+    for language in ["none", *label_map]
+}
+
+@lru_cache(maxsize=256)
+def prompt_template(age_range, language):
+    template = PROMPT_TEMPLATES.get((age_range, language))
+    return template if template is not None else compile_template(age_range, language)
+
+@lru_cache(maxsize=256)
+def template_parts(template):
+    # A template split at its fields once, so filling it in is a short join
+    # instead of str.format scanning the whole template on every request
+    return tuple((literal, field) for literal, field, _, _ in Formatter().parse(template))
+
+def fill_template(template, genre, theme, characters):
+    values = {"genre": genre, "characters": characters, "theme": theme}
+    return "".join(literal + (str(values[field]) if field else "") for literal, field in template_parts(template))
+
+def build_prompt(age_range, genre, theme, characters, language):
+    return fill_template(prompt_template(age_range, language), genre, theme, characters)
+
+TITLE_RE = re.compile(r"Title:\s*(.*)")
+MORAL_RE = re.compile(r"Moral:\s*(.*)")
+
+def compile_label_re(labels):
+    names = "|".join(re.escape(labels[key]) for key in ("title", "story", "moral"))
+    return re.compile(rf"^[\s*-]*({names})\**\s*[:：]\s*\**\s*(.*)")
+
+LABEL_RES = {lang_key: compile_label_re(labels) for lang_key, labels in label_map.items()}
+DEFAULT_LABEL_RE = compile_label_re(DEFAULT_LABELS)
+
+def parse_story(full_text, language=""):
+    # Single pass over the lines of a Gemini response:
+    #   Title: <title>
+    #   <English story body>
+    #   Moral: <moral>
+    #   <translated title/story/moral under the label_map labels>
+    # story_body is None when the Title/Moral structure is not found.
+    lang_key = language.lower() if language else "none"
+    label_re = None
+    if lang_key != "none":
+        labels = label_map.get(lang_key, DEFAULT_LABELS)
+        label_re = LABEL_RES.get(lang_key, DEFAULT_LABEL_RE)
+        label_keys = {name: key for key, name in labels.items()}
+    translated = {"title": [], "story": [], "moral": []}
+    title_match = None
+    body = []
+    moral = None
+    section = None
+
+    for line in full_text.split("\n"):
+        if title_match is None:
+            title_match = TITLE_RE.search(line)
+        elif moral is None:
+            if line.startswith("Moral:"):
+                moral = line[len("Moral:"):].strip()
+            else:
+                body.append(line)
+        elif label_re is not None:
+            label_match = label_re.match(line)
+            if label_match:
+                section = label_keys[label_match.group(1)]
+                translated[section].append(label_match.group(2))
+            elif section:
+                translated[section].append(line)
+
+    if title_match:
+        title = title_match.group(1).strip()
+        story = full_text.replace(title_match.group(0), "").strip()
+    else:
+        lines = full_text.split("\n")
+        title = lines[0].strip()
+        story = "\n".join(lines[1:]).strip()
+
+    story_body = "\n".join(body).strip() if title_match and moral is not None else ""
+    if moral is None:
+        moral_match = MORAL_RE.search(story)
+        moral = moral_match.group(1).strip() if moral_match else ""
+
+    return {
+        "title": title,
+        "story": story,
+        "story_body": story_body or None,
+        "moral": moral,
+        "translated_title": "\n".join(translated["title"]).strip(),
+        "translated_story": "\n".join(translated["story"]).strip(),
+        "translated_moral": "\n".join(translated["moral"]).strip(),
+    }
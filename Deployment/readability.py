@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+
+# Flesch Reading Ease without textstat's repeated passes. The English scorer
+# reproduces textstat 0.7's result (same punctuation stripping, sentence rule
+# and pyphen syllables) but tokenizes once and memoizes syllables per word and
+# scores per text. Indic scripts get a Flesch-style score from akshara
+# (syllable) counts, so translations can be tracked cheaply; those scores are
+# only roughly comparable with the English FRE bands.
+try:
+    import pyphen
+except ImportError:
+    pyphen = None
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+SENTENCE_RE = re.compile(r"\b[^.!?]+[.!?]*")
+INDIC_SENTENCE_RE = re.compile(r"[^.!?।॥]+[.!?।॥]*")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+FRENCH_VOWEL_GROUP_RE = re.compile(r"[aeiouyàâäéèêëîïôöùûüÿœæ]+")
+
+
+def legacy_round(number, points):
+    # textstat rounds half away from zero
+    p = 10 ** points
+    return float(int(abs(number) * p + 0.5) * (1 if number >= 0 else -1)) / p
+
+
+class FleschScorer:
+    base = 206.835
+    sentence_weight = 1.015
+    syllable_weight = 84.6
+    sentence_re = SENTENCE_RE
+    min_sentence_words = 3
+    syllable_scale = 1.0
+
+    def __init__(self):
+        # Subclasses count syllables in _syllables; memoized per word here
+        self.syllables = lru_cache(maxsize=50000)(self._syllables)
+
+    def stats(self, text):
+        words = PUNCTUATION_RE.sub("", text).lower().split()
+        syllables = sum(self.syllables(word) for word in words)
+        sentences = self.sentence_re.findall(text)
+        # Like textstat, fragments of two words or fewer are not sentences
+        short = sum(1 for s in sentences if len(PUNCTUATION_RE.sub("", s).split()) < self.min_sentence_words)
+        return len(words), max(1, len(sentences) - short), syllables
+
+    def score(self, text):
+        words, sentences, syllables = self.stats(text)
+        if not words:
+            return self.base
+        sentence_length = legacy_round(words / sentences, 1)
+        syllables_per_word = legacy_round(syllables / words / self.syllable_scale, 1)
+        return legacy_round(
+            self.base - self.sentence_weight * sentence_length - self.syllable_weight * syllables_per_word, 2
+        )
+
+
+class EnglishScorer(FleschScorer):
+    def __init__(self, dictionary="en_US"):
+        super().__init__()
+        self.hyphenator = pyphen.Pyphen(lang=dictionary) if pyphen else None
+
+    def _syllables(self, word):
+        if self.hyphenator:
+            return len(self.hyphenator.positions(word)) + 1
+        # Fallback when pyphen is missing: vowel groups, minus a silent final e
+        count = len(VOWEL_GROUP_RE.findall(word))
+        if word.endswith("e") and count > 1 and not word.endswith("le"):
+            count -= 1
+        return max(1, count)
+
+
+class FrenchScorer(FleschScorer):
+    # Kandel & Moles adaptation of the Flesch formula
+    base = 207
+    syllable_weight = 73.6
+
+    def _syllables(self, word):
+        count = len(FRENCH_VOWEL_GROUP_RE.findall(word))
+        if count > 1 and re.search(r"[^aeiouy]e?s?$", word) and word.endswith(("e", "es")):
+            count -= 1
+        return max(1, count)
+
+
+class IndicScorer(FleschScorer):
+    # Brahmi-derived scripts share one block layout: independent vowels at
+    # +0x05..+0x14 (and +0x60, +0x61), consonants at +0x15..+0x39 (and the
+    # nukta forms at +0x58..+0x5F) and the virama at +0x4D. Each independent
+    # vowel, and each consonant not silenced by a virama, starts an akshara.
+    # Words in these languages carry more aksharas than English words carry
+    # syllables, so syllable_scale divides the per-word count back to an
+    # English-like range (rough ratios measured on recorded translations).
+    sentence_re = INDIC_SENTENCE_RE
+
+    def __init__(self, block_start, syllable_scale):
+        super().__init__()
+        self.block_start = block_start
+        self.syllable_scale = syllable_scale
+
+    def _syllables(self, word):
+        count = 0
+        offsets = [ord(c) - self.block_start for c in word]
+        for i, off in enumerate(offsets):
+            if 0x05 <= off <= 0x14 or off in (0x60, 0x61):
+                count += 1
+            elif 0x15 <= off <= 0x39 or 0x58 <= off <= 0x5F:
+                if i + 1 >= len(offsets) or offsets[i + 1] != 0x4D:
+                    count += 1
+        return max(1, count)
+
+
+SCORERS = {
+    "english": EnglishScorer(),
+    "french": FrenchScorer(),
+    "hindi": IndicScorer(0x0900, 1.8),
+    "marathi": IndicScorer(0x0900, 2.0),
+    "bengali": IndicScorer(0x0980, 1.9),
+    "tamil": IndicScorer(0x0B80, 3.0),
+    "telugu": IndicScorer(0x0C00, 2.5),
+    "kannada": IndicScorer(0x0C80, 2.5),
+}
+
+
+def register_scorer(language, scorer):
+    SCORERS[language.lower()] = scorer
+    flesch_reading_ease.cache_clear()
+
+
+@lru_cache(maxsize=1024)
+def flesch_reading_ease(text, language="english"):
+    language = (language or "english").lower()
+    scorer = SCORERS.get("english" if language == "none" else language, SCORERS["english"])
+    return scorer.score(text)
@@ -0,0 +1,157 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Story generation is busy, retry after {retry_after} sec")
+        self.retry_after = retry_after
+
+
+class Reservation:
+    # A slot for work the caller runs on its own thread. wait() blocks until the
+    # slot is dispatched; release() frees it, or withdraws it while still queued.
+    def __init__(self, future, acquired, released):
+        self.future = future
+        self.acquired = acquired
+        self.released = released
+
+    def wait(self):
+        self.acquired.result()
+
+    def release(self):
+        self.future.cancel()
+        try:
+            self.released.set_result(None)
+        except InvalidStateError:
+            pass
+
+
+class GenerationScheduler:
+    # Runs LLM calls on a background asyncio loop with at most `max_in_flight`
+    # running at once. Waiting calls are queued per user and dispatched
+    # round-robin, so one user's burst cannot starve everyone else. When more
+    # than `max_queued` calls are waiting new ones are rejected with Overloaded.
+    # `prefix_limits` caps the calls running at once for all keys starting with
+    # a prefix, e.g. {"batch:": 2} keeps slots free for interactive users.
+    def __init__(self, max_in_flight=4, max_queued=32, wait_window=200, prefix_limits=None):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.prefix_limits = dict(prefix_limits or {})
+        self.prefix_in_flight = {prefix: 0 for prefix in self.prefix_limits}
+        self.queues = OrderedDict()
+        self.queued = 0
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=wait_window)
+        self.service_times = deque(maxlen=wait_window)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="generation")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="generation-scheduler", daemon=True)
+        self.thread.start()
+
+    def submit(self, user_key, fn, *args, **kwargs):
+        future = Future()
+        with self.lock:
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.queues.setdefault(user_key, deque()).append((future, time.time(), fn, args, kwargs))
+            self.queued += 1
+            self.submitted += 1
+        self.loop.call_soon_threadsafe(self._dispatch)
+        return future
+
+    def run(self, user_key, fn, *args, **kwargs):
+        return self.submit(user_key, fn, *args, **kwargs).result()
+
+    def reserve(self, user_key):
+        # Queued, limited and rejected with Overloaded like submit(), for calls
+        # the caller drives itself, e.g. a streamed Gemini response read chunk
+        # by chunk. The slot stays in flight until release().
+        acquired = Future()
+        released = Future()
+
+        async def hold():
+            acquired.set_result(None)
+            await asyncio.wrap_future(released)
+
+        return Reservation(self.submit(user_key, hold), acquired, released)
+
+    def retry_after(self):
+        service_time = sum(self.service_times) / len(self.service_times) if self.service_times else 1
+        return max(1, math.ceil(service_time * (self.queued + self.in_flight) / self.max_in_flight))
+
+    def _prefix(self, user_key):
+        return next((prefix for prefix in self.prefix_limits if str(user_key).startswith(prefix)), None)
+
+    def _at_limit(self, user_key):
+        prefix = self._prefix(user_key)
+        return prefix is not None and self.prefix_in_flight[prefix] >= self.prefix_limits[prefix]
+
+    def _dispatch(self):
+        with self.lock:
+            while self.in_flight < self.max_in_flight:
+                # First user in round-robin order whose prefix has a free slot
+                user_key = next((key for key in self.queues if not self._at_limit(key)), None)
+                if user_key is None:
+                    break
+                queue = self.queues.pop(user_key)
+                job = queue.popleft()
+                if queue:
+                    # Re-append at the back so the next user goes first
+                    self.queues[user_key] = queue
+                self.queued -= 1
+                if not job[0].set_running_or_notify_cancel():
+                    # Cancelled while waiting, e.g. a losing speculative candidate
+                    continue
+                self.in_flight += 1
+                prefix = self._prefix(user_key)
+                if prefix is not None:
+                    self.prefix_in_flight[prefix] += 1
+                self.loop.create_task(self._run(prefix, *job))
+
+    async def _run(self, prefix, future, queued_at, fn, args, kwargs):
+        started = time.time()
+        self.wait_times.append(started - queued_at)
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                result = await fn(*args, **kwargs)
+            else:
+                result = await self.loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                if prefix is not None:
+                    self.prefix_in_flight[prefix] -= 1
+                self.completed += 1
+                self.service_times.append(time.time() - started)
+            self._dispatch()
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(self.wait_times)
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "prefix_in_flight": dict(self.prefix_in_flight),
+                "queue_depth": self.queued,
+                "max_queued": self.max_queued,
+                "queued_users": len(self.queues),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_avg_sec": round(sum(waits) / len(waits), 3) if waits else 0,
+                "wait_p95_sec": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0,
+                "wait_max_sec": round(waits[-1], 3) if waits else 0,
+            }
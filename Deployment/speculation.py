@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from scheduler import Overloaded
+
+# Counters for /generate_story/queue. "wasted" candidates ran to completion
+# (and cost tokens) but were not returned; "cancelled" ones never started.
+speculation_stats = {
+    "requests": 0,
+    "candidates": 0,
+    "wasted": 0,
+    "cancelled": 0,
+}
+stats_lock = threading.Lock()
+
+
+def first_acceptable(submit, is_acceptable, candidates=1, max_calls=3):
+    # Launches up to `candidates` generations at once through `submit` (which
+    # returns a Future) and returns the first result that passes
+    # `is_acceptable`. Unfinished candidates are cancelled if still queued and
+    # ignored if already running. If a round produces nothing acceptable a new
+    # round is started until `max_calls` generations have been spent; the last
+    # result is returned when none pass, like the sequential retry loop.
+    launched = wasted = cancelled = 0
+    last_result = None
+    last_error = None
+    try:
+        while launched < max_calls:
+            pending = set()
+            for _ in range(min(candidates, max_calls - launched)):
+                try:
+                    pending.add(submit())
+                except Overloaded:
+                    # Never let extra candidates push out other users' work
+                    if pending:
+                        break
+                    if last_result is None:
+                        raise
+                    # A later round could not be queued: keep the story already paid for
+                    return last_result
+            launched += len(pending)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        last_error = future.exception()
+                        continue
+                    if last_result is not None:
+                        wasted += 1
+                    last_result = future.result()
+                    if is_acceptable(last_result):
+                        for other in pending:
+                            if other.cancel():
+                                cancelled += 1
+                            else:
+                                wasted += 1
+                        return last_result
+        if last_result is None:
+            raise last_error
+        return last_result
+    finally:
+        with stats_lock:
+            speculation_stats["requests"] += 1
+            speculation_stats["candidates"] += launched
+            speculation_stats["wasted"] += wasted
+            speculation_stats["cancelled"] += cancelled
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+# Cache of finished /generate_story payloads keyed on the normalized request
+# parameters. Each key holds a pool of up to `variants` stories; until the
+# pool is full lookups miss so new variants get generated, after that a random
+# variant is served. Payloads are stored whole, so the original latency,
+# flesch_score and psi travel with them.
+KEY_FIELDS = ("age_range", "genre", "theme", "characters", "language")
+
+
+def normalize_field(value):
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(map(str, value))
+    value = re.sub(r"\s+", " ", str(value or "")).strip().lower()
+    # The frontend joins multi-select values with commas in selection order
+    return ", ".join(sorted(part.strip() for part in value.split(",") if part.strip()))
+
+
+def cache_key(data):
+    params = {field: normalize_field(data.get(field)) for field in KEY_FIELDS}
+    if params["language"] in ("", "none", "english"):
+        params["language"] = "none"
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_keys=1000):
+        self.max_keys = max_keys
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, variants = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return list(variants)
+
+    def add(self, key, payload, max_variants, ttl):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                entry = (time.time() + ttl, [])
+                self.entries[key] = entry
+            entry[1].append(payload)
+            del entry[1][:-max_variants]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def size(self):
+        return len(self.entries)
+
+
+class MongoCacheBackend:
+    # Shared across workers. Expiry is enforced on read and by a TTL index;
+    # the least recently used keys are trimmed when max_keys is exceeded.
+    def __init__(self, collection, max_keys=1000):
+        self.collection = collection
+        self.max_keys = max_keys
+        self.evictions = 0
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self.collection.create_index("last_used")
+
+    def get(self, key):
+        now = datetime.now(timezone.utc)
+        doc = self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$set": {"last_used": now}}
+        )
+        return doc["variants"] if doc else None
+
+    def add(self, key, payload, max_variants, ttl):
+        now = datetime.now(timezone.utc)
+        # The TTL monitor only runs periodically, so drop a stale pool ourselves
+        self.collection.delete_one({"_id": key, "expires_at": {"$lte": now}})
+        self.collection.update_one(
+            {"_id": key},
+            {
+                "$push": {"variants": {"$each": [payload], "$slice": -max_variants}},
+                "$set": {"last_used": now},
+                "$setOnInsert": {"expires_at": now + timedelta(seconds=ttl)},
+            },
+            upsert=True
+        )
+        excess = self.collection.estimated_document_count() - self.max_keys
+        if excess > 0:
+            oldest = [doc["_id"] for doc in self.collection.find({}, {"_id": 1}).sort("last_used", 1).limit(excess)]
+            self.evictions += self.collection.delete_many({"_id": {"$in": oldest}}).deleted_count
+
+    def size(self):
+        return self.collection.estimated_document_count()
+
+
+class StoryCache:
+    def __init__(self, backend, variants=3, ttl=24 * 3600):
+        self.backend = backend
+        self.variants = variants
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def lookup(self, data):
+        variants = self.backend.get(cache_key(data))
+        if not variants or len(variants) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(random.choice(variants), cached=True)
+
+    def store(self, data, payload):
+        self.backend.add(cache_key(data), payload, self.variants, self.ttl)
+        self.stores += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "stores": self.stores,
+            "evictions": self.backend.evictions,
+            "keys": self.backend.size(),
+            "variants_per_key": self.variants,
+            "ttl_sec": self.ttl,
+        }
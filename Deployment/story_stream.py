@@ -0,0 +1,113 @@
+import json
+
+from prompts import TITLE_RE
+
+# Incremental parser for streamed Gemini output in the
+# "Title: ... / story text / Moral: ..." format used by generate_story.
+MORAL_MARKER = "\nMoral:"
+
+
+class StoryStreamParser:
+    def __init__(self):
+        self.full_text = ""
+        self.state = "title"
+        self.pos = 0
+        self.story_started = False
+
+    def feed(self, text):
+        self.full_text += text
+        return self._advance(final=False)
+
+    def close(self):
+        return self._advance(final=True)
+
+    def _advance(self, final):
+        events = []
+        if self.state == "title":
+            events += self._parse_title(final)
+        if self.state == "story":
+            events += self._parse_story(final)
+        if self.state == "moral":
+            events += self._parse_moral(final)
+        return events
+
+    def _parse_title(self, final):
+        while True:
+            newline = self.full_text.find("\n", self.pos)
+            if newline == -1:
+                if not final:
+                    return []
+                newline = len(self.full_text)
+            line = self.full_text[self.pos:newline].strip()
+            self.pos = newline + 1
+            if line or newline >= len(self.full_text):
+                break
+        self.state = "story"
+        # Same title rule as prompts.parse_story, so "title" and "done" agree
+        title_match = TITLE_RE.search(line)
+        if title_match:
+            line = title_match.group(1).strip()
+        return [{"event": "title", "text": line}]
+
+    def _parse_story(self, final):
+        # Search from the newline that ended the title so a moral that
+        # immediately follows it is still found.
+        start = max(self.pos - 1, 0)
+        marker = self.full_text.find(MORAL_MARKER, start)
+        if marker != -1:
+            end = marker
+        elif final:
+            end = len(self.full_text)
+        else:
+            # Hold back a trailing partial line that could still turn into "Moral:"
+            end = len(self.full_text)
+            last_newline = self.full_text.rfind("\n", start)
+            if last_newline != -1 and MORAL_MARKER.startswith(self.full_text[last_newline:end]):
+                end = last_newline
+        events = []
+        delta = self.full_text[self.pos:end] if end > self.pos else ""
+        if delta:
+            if not self.story_started:
+                delta = delta.lstrip()
+            if delta:
+                self.story_started = True
+                events.append({"event": "story", "text": delta})
+            self.pos = end
+        if marker != -1:
+            self.pos = marker + len(MORAL_MARKER)
+            self.state = "moral"
+        elif final:
+            self.state = "done"
+        return events
+
+    def _parse_moral(self, final):
+        newline = self.full_text.find("\n", self.pos)
+        if newline == -1:
+            if not final:
+                return []
+            newline = len(self.full_text)
+        moral = self.full_text[self.pos:newline].strip()
+        self.pos = newline
+        self.state = "done"
+        return [{"event": "moral", "text": moral}]
+
+
+def chunk_text(chunk):
+    # Gemini raises ValueError on .text for chunks without parts (e.g. safety stops)
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def iter_story_events(chunks, parser=None):
+    parser = parser or StoryStreamParser()
+    for chunk in chunks:
+        for event in parser.feed(chunk_text(chunk)):
+            yield event
+    for event in parser.close():
+        yield event
+
+
+def to_ndjson(event):
+    return json.dumps(event, ensure_ascii=False) + "\n"
@@ -54,6 +54,13 @@ const languageSpeechMap = {
   // Add more as needed
 };
 
+// Turn server narration segments into utterance texts with pause markers
+function segmentsToParts(segments) {
+  return segments.flatMap(segment =>
+    segment.pause_after_sec ? [segment.text, "__PAUSE__"] : [segment.text]
+  );
+}
+
 function App() {
   const [showWelcome, setShowWelcome] = useState(true);
   const [age, setAge] = useState("");
@@ -128,8 +135,9 @@ function App() {
     if (!story) return;
     synth.cancel(); // Always cancel before starting new narration
 
-    // Narrate title, then pause, then story, then pause, then moral
-    const narrationParts = [
+    // Narrate title, then pause, then story, then pause, then moral.
+    // Prefer the server's pre-segmented chunks when present.
+    const narrationParts = story.narration ? segmentsToParts(story.narration.english) : [
       `Title: ${story.title}`,
       "__PAUSE__",
       story.story.replace(
@@ -190,24 +198,31 @@ function App() {
     const langLabels = labels[language];
     if (!langLabels) return;
 
-    // Extract translated title and story
-    const titleRegex = new RegExp(`${langLabels.title}[:：]?\\s*(.*)`, "i");
-    const storyRegex = new RegExp(`${langLabels.story}[:：]?\\s*([\\s\\S]*?)(?=\\n\\w+[:：]|$)`, "i");
-    const titleMatch = story.story.match(titleRegex);
-    const storyMatch = story.story.match(storyRegex);
+    const narrationParts = story.narration && story.narration.translated.length
+      ? segmentsToParts(story.narration.translated)
+      : extractTranslatedParts();
+    if (!narrationParts.length) return;
 
-    const translatedTitle = titleMatch ? titleMatch[1].trim() : "";
-    const translatedStory = storyMatch ? storyMatch[1].trim() : "";
+    function extractTranslatedParts() {
+      // Extract translated title and story
+      const titleRegex = new RegExp(`${langLabels.title}[:：]?\\s*(.*)`, "i");
+      const storyRegex = new RegExp(`${langLabels.story}[:：]?\\s*([\\s\\S]*?)(?=\\n\\w+[:：]|$)`, "i");
+      const titleMatch = story.story.match(titleRegex);
+      const storyMatch = story.story.match(storyRegex);
 
-    if (!translatedTitle && !translatedStory) return;
+      const translatedTitle = titleMatch ? titleMatch[1].trim() : "";
+      const translatedStory = storyMatch ? storyMatch[1].trim() : "";
 
-    // Narrate with pauses after section labels
-    const narrationParts = [
-      `${langLabels.title}:`, "__PAUSE__",
-      translatedTitle, "__PAUSE__",
-      `${langLabels.story}:`, "__PAUSE__",
-      translatedStory
-    ];
+      if (!translatedTitle && !translatedStory) return [];
+
+      // Narrate with pauses after section labels
+      return [
+        `${langLabels.title}:`, "__PAUSE__",
+        translatedTitle, "__PAUSE__",
+        `${langLabels.story}:`, "__PAUSE__",
+        translatedStory
+      ];
+    }
 
     let idx = 0;
     setIsNarrating(true);
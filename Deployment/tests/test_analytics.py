@@ -0,0 +1,39 @@
+import pytest
+
+from analytics import ROLLUP_COLLECTIONS, Rollups, as_number
+
+
+class RecordingCollection:
+    # mongomock's bulk_write does not accept pymongo's UpdateOne, so keep the updates instead
+    def __init__(self):
+        self.updates = {}
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            self.updates[request._filter["_id"]] = request._doc["$inc"]
+
+
+@pytest.fixture
+def rollups():
+    return Rollups({name: RecordingCollection() for name in ROLLUP_COLLECTIONS})
+
+
+def feedback(rating, latency="2.5 sec"):
+    return {"datetime": "2026-10-17 10:00:00", "genre": "Fantasy", "language": "Hindi",
+            "rating": rating, "latency": latency}
+
+
+@pytest.mark.parametrize("value, expected", [("12.34 sec", 12.34), (3, 3.0), ("nan", None), (float("inf"), None),
+                                             ("-inf sec", None), ("", None), (None, None)])
+def test_as_number(value, expected):
+    assert as_number(value) == expected
+
+
+def test_bad_ratings_are_skipped_per_document(rollups):
+    rollups.on_write("feedback", [feedback(5), feedback(float("nan")), feedback("inf"), feedback(0), feedback(6),
+                                  feedback(3, latency="nan sec")])
+    ratings = rollups.collections["daily_ratings"].updates["2026-10-17|fantasy|hindi"]
+    assert ratings == {"stories": 6, "rated": 2, "rating_sum": 8.0, "stars.5": 1, "stars.3": 1}
+    latency = rollups.collections["daily_latency"].updates["2026-10-17|fantasy|hindi"]
+    assert latency["count"] == 5
+    assert latency["latency_sum"] == 12.5
@@ -0,0 +1,52 @@
+import mongomock
+
+from batch import BatchRunner, split_packed
+
+STORY = "Title: T\nOnce upon a time.\nMoral: Be kind."
+
+
+def test_split_packed():
+    text = "Sure, here they are.\n=== STORY 1 ===\nTitle: A\nOne.\n\n===STORY 2===\nTitle: B\nTwo.\n=== story 9 ===\nextra"
+    assert split_packed(text, 2) == {0: "Title: A\nOne.", 1: "Title: B\nTwo."}
+
+
+def test_split_packed_missing_story():
+    assert split_packed("=== STORY 2 ===\nTitle: B\nTwo.", 3) == {1: "Title: B\nTwo."}
+    assert split_packed("no separators at all", 2) == {}
+
+
+def make_runner(generate):
+    return BatchRunner(
+        mongomock.MongoClient().db.batch_jobs,
+        generate=generate,
+        finalize=lambda item, text, latency: {"story": text},
+        within_band=lambda text, score_min, score_max: True,
+        get_band=lambda age_range: (0, 100),
+        build_prompt=lambda item: item["genre"],
+        pack_size=1,
+        per_minute=0,
+    )
+
+
+def test_failed_item_is_retried_on_resume():
+    blocked = {"Dragon"}
+
+    def generate(job_id, prompt):
+        if prompt in blocked:
+            raise ValueError("safety block")
+        return STORY
+
+    runner = make_runner(generate)
+    job_id = runner.create_job([{"genre": "Dragon"}, {"genre": "Kite"}, "not an item"])
+    results = dict(runner.run(job_id))
+    assert "error" in results[0] and "error" in results[2]
+    assert results[1] == {"story": STORY}
+    assert runner.progress(job_id)["completed"] == 1
+    assert runner.progress(job_id)["failed"] == 2
+
+    blocked.clear()
+    assert [index for index, _ in runner.run(job_id)] in ([0, 2], [2, 0])
+    progress = runner.progress(job_id)
+    assert progress["completed"] == 2
+    assert progress["failed"] == 1
+    assert progress["status"] == "done"
@@ -0,0 +1,22 @@
+import pytest
+
+import prompt_variants
+from benchmarks.bench_prompts import legacy_build_prompt
+from prompts import AGE_BANDS, build_prompt, fill_template, label_map
+
+LANGUAGES = ["none", "", *label_map, "Klingon"]
+
+
+@pytest.mark.parametrize("age_range", [*AGE_BANDS, "3-5", "7-9"])
+@pytest.mark.parametrize("language", LANGUAGES)
+def test_build_prompt_matches_legacy(age_range, language):
+    assert build_prompt(age_range, "Adventure", "Friendship", "Riya, Arun", language) == \
+        legacy_build_prompt(age_range, "Adventure", "Friendship", "Riya, Arun", language)
+
+
+@pytest.mark.parametrize("variant", list(prompt_variants.VARIANTS))
+def test_fill_template_matches_format(variant):
+    for language in LANGUAGES:
+        template = prompt_variants.prompt_template(variant, "9-15", language)
+        assert fill_template(template, "Space {opera}", "Courage", "Meera}") == \
+            template.format(genre="Space {opera}", characters="Meera}", theme="Courage")
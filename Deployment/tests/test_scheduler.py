@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import GenerationScheduler, Overloaded
+
+
+def test_full_queue_raises_overloaded():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queued=2)
+    release = threading.Event()
+    running = scheduler.submit("a", release.wait)
+    time.sleep(0.05)
+    queued = [scheduler.submit("b", lambda: "b"), scheduler.submit("c", lambda: "c")]
+    with pytest.raises(Overloaded) as excinfo:
+        scheduler.submit("d", lambda: "d")
+    assert excinfo.value.retry_after >= 1
+    assert scheduler.stats()["rejected"] == 1
+
+    release.set()
+    assert running.result(timeout=2)
+    assert [future.result(timeout=2) for future in queued] == ["b", "c"]
+
+
+def test_prefix_limit_keeps_a_slot_free():
+    scheduler = GenerationScheduler(max_in_flight=2, max_queued=20, prefix_limits={"batch:": 1})
+    lock = threading.Lock()
+    running = []
+    peak = {"batch": 0}
+
+    def work(kind):
+        with lock:
+            running.append(kind)
+            peak["batch"] = max(peak["batch"], running.count("batch"))
+        time.sleep(0.02)
+        with lock:
+            running.remove(kind)
+        return kind
+
+    futures = [scheduler.submit(f"batch:{job}", work, "batch") for job in ("j1", "j2") for _ in range(3)]
+    futures.append(scheduler.submit("user", work, "user"))
+    assert [future.result(timeout=5) for future in futures][-1] == "user"
+    assert peak["batch"] == 1
+    assert scheduler.stats()["prefix_in_flight"] == {"batch:": 0}
+
+
+def test_reservation_holds_a_slot_until_released():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queued=5)
+    reservation = scheduler.reserve("stream")
+    reservation.wait()
+    other = scheduler.submit("user", lambda: "done")
+    time.sleep(0.05)
+    assert not other.done()
+    reservation.release()
+    assert other.result(timeout=2) == "done"
+    assert scheduler.stats()["in_flight"] == 0
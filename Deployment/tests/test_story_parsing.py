@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from prompts import parse_story
+from story_stream import StoryStreamParser
+
+RECORDED = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "data", "recorded_outputs.jsonl")
+
+
+def recorded_outputs():
+    with open(RECORDED, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stream_events(text, chunk_size):
+    parser = StoryStreamParser()
+    events = []
+    for i in range(0, len(text), chunk_size):
+        events += parser.feed(text[i:i + chunk_size])
+    return events + parser.close()
+
+
+@pytest.mark.parametrize("record", recorded_outputs(), ids=lambda r: f"{r['age_range']}-{r['language']}")
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+def test_stream_matches_final_parse(record, chunk_size):
+    parsed = parse_story(record["text"], record["language"])
+    events = stream_events(record["text"], chunk_size)
+
+    assert [e["text"] for e in events if e["event"] == "title"] == [parsed["title"]]
+    assert "".join(e["text"] for e in events if e["event"] == "story").strip() == parsed["story_body"]
+    assert [e["text"] for e in events if e["event"] == "moral"] == [parsed["moral"]]
+
+
+def test_markdown_title_agrees():
+    text = "**Title: The Kite**\nOnce upon a time.\nMoral: Be kind."
+    events = stream_events(text, 5)
+    assert events[0] == {"event": "title", "text": parse_story(text)["title"]}
+
+
+def test_translation_is_split_out():
+    record = next(r for r in recorded_outputs() if r["language"] == "hindi")
+    parsed = parse_story(record["text"], "hindi")
+    assert parsed["translated_story"]
+    assert parsed["translated_story"] not in parsed["story_body"]
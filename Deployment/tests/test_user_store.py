@@ -0,0 +1,58 @@
+import mongomock
+import pytest
+
+from user_store import UserStore
+
+
+@pytest.fixture
+def store():
+    return UserStore(mongomock.MongoClient().db.users, iterations=1000)
+
+
+def test_register_and_authenticate(store):
+    assert store.register("riya", "kite-123", "9999999999", "riya@example.com")
+    assert not store.register("riya", "other", "9999999999", "riya@example.com")
+    user = store.authenticate("riya", "kite-123")
+    assert user["username"] == "riya"
+    assert store.authenticate("riya", "wrong") is None
+    assert store.authenticate("nobody", "kite-123") is None
+    assert "password" not in store.collection.find_one({"username": "riya"})
+
+
+def test_cached_credentials(store):
+    store.register("riya", "kite-123", "1", "r@example.com")
+    store.authenticate("riya", "kite-123")
+    store.authenticate("riya", "kite-123")
+    assert store.cache_hits == 1
+    assert store.authenticate("riya", "wrong") is None
+
+
+def test_legacy_plaintext_password_is_upgraded(store):
+    store.collection.insert_one({"username": "kabir", "password": "नमस्ते"})
+    assert store.authenticate("kabir", "wrong") is None
+    assert store.authenticate("kabir", "नमस्ते")["username"] == "kabir"
+    doc = store.collection.find_one({"username": "kabir"})
+    assert "password" not in doc and doc["password_hash"]
+    assert UserStore(store.collection, iterations=1000).authenticate("kabir", "नमस्ते")
+
+
+@pytest.mark.parametrize("username, password", [("riya", 123), ("riya", None), ({"$ne": None}, "x"), ("", "x")])
+def test_non_string_credentials_are_rejected(store, username, password):
+    store.register("riya", "kite-123", "1", "r@example.com")
+    assert store.authenticate(username, password) is None
+
+
+def test_register_rejects_non_strings(store):
+    with pytest.raises(TypeError):
+        store.register("riya", 123, "1", "r@example.com")
+
+
+def test_tokens(store):
+    store.register("riya", "kite-123", "1", "r@example.com")
+    user = store.authenticate("riya", "kite-123")
+    token = store.issue_token(user)
+    assert store.resolve_token(token) == user
+    assert store.resolve_token("not-a-token") is None
+    assert store.resolve_token({"a": 1}) is None
+    assert store.resolve_token(["a"]) is None
+    assert store.resolve_token(None) is None
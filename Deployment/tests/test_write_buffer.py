@@ -0,0 +1,88 @@
+import time
+
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect
+
+from write_buffer import BufferFull, WriteBehindBuffer
+
+
+class FlakyCollection:
+    # mongomock collection whose inserts fail while `down` is set
+    def __init__(self):
+        self.collection = mongomock.MongoClient().db.feedback
+        self.down = False
+        self.attempts = 0
+
+    def insert_many(self, documents, ordered=True):
+        self.attempts += 1
+        if self.down:
+            raise AutoReconnect("connection refused")
+        return self.collection.insert_many(documents, ordered=ordered)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_flush_on_close():
+    collection = mongomock.MongoClient().db.feedback
+    written = []
+    buffer = WriteBehindBuffer({"feedback": collection}, batch_size=100, flush_interval=60,
+                               on_write=lambda name, documents: written.append((name, len(documents))))
+    for i in range(5):
+        buffer.put("feedback", {"i": i})
+    assert collection.count_documents({}) == 0
+    buffer.close()
+    assert collection.count_documents({}) == 5
+    assert written == [("feedback", 5)]
+    with pytest.raises(BufferFull):
+        buffer.put("feedback", {"i": 5})
+
+
+def test_failed_batch_is_retried():
+    flaky = FlakyCollection()
+    flaky.down = True
+    buffer = WriteBehindBuffer({"feedback": flaky}, batch_size=2, flush_interval=0.02, retry_backoff=0.05)
+    for i in range(3):
+        buffer.put("feedback", {"i": i})
+    assert wait_for(lambda: flaky.attempts >= 2)
+    stats = buffer.stats()
+    assert stats["failed"] == 0
+    assert stats["pending"] == 3
+    assert stats["retrying"] == {"feedback": stats["retrying"]["feedback"]}
+
+    flaky.down = False
+    assert wait_for(lambda: flaky.collection.count_documents({}) == 3)
+    buffer.close()
+    assert buffer.stats()["written"] == 3
+    assert buffer.stats()["retrying"] == {}
+
+
+def test_batch_dropped_after_max_retries():
+    flaky = FlakyCollection()
+    flaky.down = True
+    buffer = WriteBehindBuffer({"feedback": flaky}, batch_size=1, flush_interval=0.01, max_retries=2,
+                               retry_backoff=0.01)
+    buffer.put("feedback", {"i": 0})
+    assert wait_for(lambda: buffer.stats()["failed"] == 1)
+    assert flaky.attempts == 3
+    assert buffer.stats()["pending"] == 0
+    buffer.close()
+
+
+def test_partial_write_retries_only_unwritten_documents():
+    collection = mongomock.MongoClient().db.feedback
+    collection.insert_one({"_id": 1})
+    buffer = WriteBehindBuffer({"feedback": collection}, batch_size=100, flush_interval=60)
+    buffer.put("feedback", {"_id": 1})
+    buffer.put("feedback", {"_id": 2})
+    buffer.close()
+    # The duplicate counts as already written, so nothing is retried or lost
+    assert collection.count_documents({}) == 2
+    assert buffer.stats()["failed"] == 0
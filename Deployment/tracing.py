@@ -0,0 +1,285 @@
+import bisect
+import cProfile
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from prompts import AGE_BANDS, AGE_BAND_ALIASES, label_map
+from story_cache import normalize_field
+
+# Request-level tracing and Prometheus-style metrics, without dependencies.
+# A Trace is started per generation request and collects timed spans (prompt
+# build, each LLM attempt, parse, FRE scoring, drift evaluation, Mongo writes),
+# the number of LLM calls and prompt/response token counts. Every span is also
+# observed into a histogram, traced or not, so batch workers show up in
+# /metrics too. render_metrics() returns the text exposition format.
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 12, 15, 20, 30, 60]
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, series in sorted(self.series.items()):
+                labels = format_labels(self.labels, label_values)
+                cumulative = 0
+                for bound, count in zip(self.buckets + ["+Inf"], series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{labels}}} {round(series['sum'], 6)}")
+                lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount, *label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{{{format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def format_labels(names, values):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_seconds = Histogram(
+    "story_request_seconds", "End-to-end generation request latency.", ["endpoint", "age_band", "language"]
+)
+span_seconds = Histogram("story_span_seconds", "Time spent per instrumented span.", ["span"])
+llm_calls = Counter("story_llm_calls_total", "Gemini calls made.", ["endpoint", "age_band", "language"])
+retries = Counter("story_retries_total", "Gemini calls beyond the first per request.", ["endpoint", "age_band", "language"])
+tokens = Counter("story_tokens_total", "Prompt and response tokens.", ["endpoint", "kind"])
+requests_total = Counter("story_requests_total", "Generation requests by outcome.", ["endpoint", "outcome"])
+prompt_requests = Counter("story_prompt_requests_total", "Requests per prompt variant.", ["variant", "age_band", "language"])
+prompt_checks = Counter("story_prompt_band_checks_total", "Generated stories checked against the FRE band per prompt variant.",
+                        ["variant", "age_band", "language"])
+prompt_passes = Counter("story_prompt_band_passes_total", "Generated stories inside the FRE band per prompt variant.",
+                        ["variant", "age_band", "language"])
+METRICS = [request_seconds, span_seconds, llm_calls, retries, tokens, requests_total, prompt_requests, prompt_checks,
+           prompt_passes]
+
+local = threading.local()
+
+# Age band and language come from the request body; anything outside the known
+# values is counted as "other" so clients cannot create unbounded series
+METRIC_LANGUAGES = {"none", *label_map}
+
+
+def metric_labels(age_band, language):
+    age_band = normalize_field(age_band) or "none"
+    age_band = AGE_BAND_ALIASES.get(age_band, age_band)
+    language = normalize_field(language) or "none"
+    return (age_band if age_band in AGE_BANDS or age_band == "none" else "other",
+            language if language in METRIC_LANGUAGES else "other")
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English; only used when the
+    # response carries no usage metadata
+    return max(1, len(text or "") // 4)
+
+
+def token_counts(prompt, response, text=None):
+    # Streamed responses carry the usage metadata on their last chunk, so the
+    # full text is passed separately for the estimate
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    if response_tokens is None:
+        response_tokens = estimate_tokens(text if text is not None else getattr(response, "text", ""))
+    return prompt_tokens, response_tokens
+
+
+class Trace:
+    def __init__(self, endpoint, age_band, language):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.endpoint = endpoint
+        self.labels = (endpoint, *metric_labels(age_band, language))
+        self.started = time.perf_counter()
+        self.spans = []
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.outcome = "ok"
+        self.variant = None
+        self.band_checks = 0
+        self.band_passes = 0
+        self.elapsed = None
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.spans.append((name, seconds))
+
+    def wrap_llm(self, fn, prompt):
+        # Times a Gemini call on whichever thread runs it (scheduler workers)
+        # and attributes it to this trace
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            response = None
+            try:
+                response = fn(*args, **kwargs)
+                return response
+            finally:
+                self.record_llm_call(time.perf_counter() - started, prompt, response)
+        return call
+
+    def record_llm_call(self, seconds, prompt, response, text=None):
+        span_seconds.observe(seconds, "llm_attempt")
+        prompt_tokens, response_tokens = token_counts(prompt, response, text) if response is not None else (0, 0)
+        with self.lock:
+            self.spans.append(("llm_attempt", seconds))
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+
+    def record_band_check(self, passed):
+        with self.lock:
+            self.band_checks += 1
+            self.band_passes += bool(passed)
+
+    def finish(self):
+        self.elapsed = elapsed = time.perf_counter() - self.started
+        if self.variant:
+            variant_labels = (self.variant, *self.labels[1:])
+            prompt_requests.inc(1, *variant_labels)
+            prompt_checks.inc(self.band_checks, *variant_labels)
+            prompt_passes.inc(self.band_passes, *variant_labels)
+        request_seconds.observe(elapsed, *self.labels)
+        requests_total.inc(1, self.endpoint, self.outcome)
+        llm_calls.inc(self.llm_calls, *self.labels)
+        retries.inc(max(0, self.llm_calls - 1), *self.labels)
+        tokens.inc(self.prompt_tokens, self.endpoint, "prompt")
+        tokens.inc(self.response_tokens, self.endpoint, "response")
+        return elapsed
+
+    def server_timing(self):
+        # Server-Timing header value; repeated spans are numbered (llm_attempt_2, ...)
+        seen = {}
+        parts = []
+        with self.lock:
+            for name, seconds in self.spans:
+                seen[name] = seen.get(name, 0) + 1
+                label = name if seen[name] == 1 else f"{name}_{seen[name]}"
+                parts.append(f"{label};dur={seconds * 1000:.1f}")
+        if self.elapsed is not None:
+            parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(parts)
+
+    def summary(self):
+        with self.lock:
+            return {
+                "trace_id": self.trace_id,
+                "llm_calls": self.llm_calls,
+                "retries": max(0, self.llm_calls - 1),
+                "prompt_tokens": self.prompt_tokens,
+                "response_tokens": self.response_tokens,
+                "spans": [{"name": name, "ms": round(seconds * 1000, 2)} for name, seconds in self.spans],
+            }
+
+
+@contextmanager
+def start_trace(endpoint, age_band, language, on_finish=None):
+    trace = Trace(endpoint, age_band, language)
+    previous = getattr(local, "trace", None)
+    local.trace = trace
+    try:
+        yield trace
+    except Exception:
+        trace.outcome = "error"
+        raise
+    finally:
+        local.trace = previous
+        trace.finish()
+        if on_finish:
+            on_finish(trace)
+
+
+def current_trace():
+    return getattr(local, "trace", None)
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        span_seconds.observe(elapsed, name)
+        trace = current_trace()
+        if trace is not None:
+            trace.record(name, elapsed)
+
+
+def start_profile():
+    # cProfile of the calling thread only; Gemini calls on scheduler workers
+    # show up as time spent waiting on their futures
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler, directory, name):
+    profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def render_metrics(extra=()):
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name, help, values, label="name"):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{key}"}} {value}')
+    return lines
+
+
+def labelled_gauge_lines(name, help, label_names, rows):
+    # rows: (label values, value) pairs
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for label_values, value in rows:
+        lines.append(f"{name}{{{format_labels(label_names, label_values)}}} {value}")
+    return lines
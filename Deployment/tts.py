@@ -0,0 +1,206 @@
+import hashlib
+import io
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from array import array
+
+# Server-side narration audio. An engine turns text into audio bytes; the
+# AudioCache stores them on disk under a hash of (engine, text, language,
+# voice), so a story that has been narrated once is served from disk.
+
+# speechSynthesis language codes to espeak-ng voice names
+ESPEAK_VOICES = {
+    "en-GB": "en-gb",
+    "hi-IN": "hi",
+    "te-IN": "te",
+    "ta-IN": "ta",
+    "kn-IN": "kn",
+    "mr-IN": "mr",
+    "bn-IN": "bn",
+    "fr-FR": "fr",
+}
+
+
+def compress_wav(wav_bytes):
+    # Ogg/Opus is far smaller than WAV; keep WAV when ffmpeg is not installed
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return wav_bytes, "audio/wav"
+    result = subprocess.run(
+        [ffmpeg, "-loglevel", "error", "-i", "pipe:0", "-c:a", "libopus", "-b:a", "32k", "-f", "ogg", "pipe:1"],
+        input=wav_bytes, capture_output=True, check=True
+    )
+    return result.stdout, "audio/ogg"
+
+
+class StubEngine:
+    # Dependency-free engine for development and load tests: a quiet tone
+    # whose length follows the word count, rendered with the wave module.
+    name = "stub"
+
+    def __init__(self, sample_rate=8000, words_per_second=2.5):
+        self.sample_rate = sample_rate
+        self.words_per_second = words_per_second
+
+    def render(self, text, lang, voice=None):
+        seconds = max(0.5, len(text.split()) / self.words_per_second)
+        frames = int(seconds * self.sample_rate)
+        period = array("h", (int(800 * math.sin(2 * math.pi * i / 32)) for i in range(32)))
+        samples = (period * (frames // len(period) + 1))[:frames]
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(samples.tobytes())
+        return buffer.getvalue(), "audio/wav"
+
+
+class EspeakEngine:
+    name = "espeak"
+
+    def __init__(self, binary=None, speed=150):
+        self.binary = binary or shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.binary:
+            raise RuntimeError("espeak-ng is not installed")
+        self.speed = speed
+
+    def render(self, text, lang, voice=None):
+        voice = voice or ESPEAK_VOICES.get(lang, "en-gb")
+        if voice not in ESPEAK_VOICES.values():
+            raise ValueError(f"Unknown espeak voice: {voice}")
+        # The text goes in on stdin so text starting with "-" is never read as an option
+        result = subprocess.run(
+            [self.binary, "-v", voice, "-s", str(self.speed), "--stdout", "--stdin"],
+            input=text.encode("utf-8"), capture_output=True, check=True
+        )
+        return compress_wav(result.stdout)
+
+
+class Pyttsx3Engine:
+    name = "pyttsx3"
+
+    def __init__(self):
+        import pyttsx3
+        self.engine = pyttsx3.init()
+        self.lock = threading.Lock()
+
+    def render(self, text, lang, voice=None):
+        with self.lock, tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "narration.wav")
+            if voice:
+                self.engine.setProperty("voice", voice)
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            with open(path, "rb") as f:
+                return compress_wav(f.read())
+
+
+ENGINES = {
+    "stub": StubEngine,
+    "espeak": EspeakEngine,
+    "pyttsx3": Pyttsx3Engine,
+}
+
+EXTENSIONS = {"audio/wav": ".wav", "audio/ogg": ".ogg"}
+
+
+class AudioCache:
+    # Files live at <directory>/<key[:2]>/<key><ext>. Reads refresh the file's
+    # mtime and the least recently used files are removed once the cache grows
+    # past max_bytes.
+    def __init__(self, directory, engine, max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.render_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._files())
+
+    def key(self, text, lang, voice=None):
+        raw = "\x1f".join([self.engine.name, lang or "", voice or "", text])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                yield path, stat.st_mtime, stat.st_size
+
+    def path(self, key):
+        if len(key) != 64 or not all(c in "0123456789abcdef" for c in key):
+            return None
+        folder = os.path.join(self.directory, key[:2])
+        for ext in EXTENSIONS.values():
+            path = os.path.join(folder, key + ext)
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+        return None
+
+    def get_or_render(self, text, lang, voice=None):
+        key = self.key(text, lang, voice)
+        path = self.path(key)
+        if path:
+            self.hits += 1
+            return key, path
+        with self.lock:
+            render_lock = self.render_locks.setdefault(key, threading.Lock())
+        # Only one thread renders a given narration; the others wait and reuse it.
+        # The lock is dropped however the render ends, so failed renders do not pile up.
+        try:
+            with render_lock:
+                path = self.path(key)
+                if path:
+                    self.hits += 1
+                    return key, path
+                self.misses += 1
+                audio, mimetype = self.engine.render(text, lang, voice)
+                folder = os.path.join(self.directory, key[:2])
+                os.makedirs(folder, exist_ok=True)
+                path = os.path.join(folder, key + EXTENSIONS[mimetype])
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, path)
+        finally:
+            with self.lock:
+                self.render_locks.pop(key, None)
+        with self.lock:
+            self.total_bytes += len(audio)
+            if self.total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return key, path
+
+    def _evict(self, keep):
+        for path, _, size in sorted(self._files(), key=lambda f: f[1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "engine": self.engine.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
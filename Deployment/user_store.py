@@ -0,0 +1,158 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+
+
+def hash_password(password, iterations=200000, salt=None):
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations)
+    return f"{HASH_ALGORITHM}${iterations}${salt}${digest.hex()}"
+
+
+def verify_password(password, password_hash):
+    try:
+        algorithm, iterations, salt, _ = password_hash.split("$")
+    except (AttributeError, ValueError):
+        return False
+    if algorithm != HASH_ALGORITHM:
+        return False
+    return hmac.compare_digest(hash_password(password, int(iterations), salt), password_hash)
+
+
+class TTLCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class UserStore:
+    # Users are looked up by username only (unique index) and checked against a
+    # salted PBKDF2 hash. After a successful check the user is remembered for
+    # `cache_ttl` seconds under a keyed digest of the password, so repeat logins
+    # skip both MongoDB and the slow hash. Login also issues a session token
+    # valid for `token_ttl` seconds that can be presented instead.
+    def __init__(self, collection, cache_ttl=300, cache_size=10000, token_ttl=3600, iterations=200000):
+        self.collection = collection
+        self.iterations = iterations
+        self.credentials = TTLCache(cache_ttl, cache_size)
+        self.tokens = TTLCache(token_ttl, cache_size)
+        self.cache_key = os.urandom(32)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.token_hits = 0
+
+    def ensure_indexes(self):
+        try:
+            self.collection.create_index("username", unique=True)
+        except (DuplicateKeyError, OperationFailure):
+            # Older data allowed one username per password; keep lookups indexed
+            # until the duplicates are cleaned up.
+            self.collection.create_index("username")
+
+    def _password_digest(self, password):
+        return hmac.new(self.cache_key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def register(self, username, password, mobile, gmail):
+        if not all(isinstance(value, str) for value in (username, password, mobile, gmail)):
+            raise TypeError("username, password, mobile and gmail must be strings")
+        if self.collection.find_one({"username": username}, {"_id": 1}):
+            return False
+        try:
+            self.collection.insert_one({
+                "username": username,
+                "password_hash": hash_password(password, self.iterations),
+                "mobile": mobile,
+                "gmail": gmail,
+                "registered_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def authenticate(self, username, password):
+        if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+            return None
+        digest = self._password_digest(password)
+        cached = self.credentials.get(username)
+        if cached and hmac.compare_digest(cached["digest"], digest):
+            self.cache_hits += 1
+            return cached["user"]
+        self.cache_misses += 1
+
+        user = None
+        for doc in self.collection.find({"username": username}, {"password_hash": 1, "password": 1}):
+            if "password_hash" in doc:
+                if verify_password(password, doc["password_hash"]):
+                    user = doc
+                    break
+            elif doc.get("password") is not None and hmac.compare_digest(
+                    str(doc["password"]).encode("utf-8"), password.encode("utf-8")):
+                # Plaintext account from before hashing: upgrade it in place
+                self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"password_hash": hash_password(password, self.iterations)}, "$unset": {"password": ""}}
+                )
+                user = doc
+                break
+        if user is None:
+            return None
+        user = {"user_id": str(user["_id"]), "username": username}
+        self.credentials.set(username, {"digest": digest, "user": user})
+        return user
+
+    def issue_token(self, user):
+        token = secrets.token_urlsafe(32)
+        self.tokens.set(token, user)
+        return token
+
+    def resolve_token(self, token):
+        user = self.tokens.get(token) if isinstance(token, str) and token else None
+        if user:
+            self.token_hits += 1
+        return user
+
+    def stats(self):
+        return {
+            "cached_credentials": len(self.credentials),
+            "active_tokens": len(self.tokens),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "token_hits": self.token_hits,
+        }
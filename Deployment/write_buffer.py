@@ -0,0 +1,172 @@
+import threading
+import time
+
+
+class BufferFull(Exception):
+    pass
+
+
+class WriteBehindBuffer:
+    # Collects documents per collection and writes them with insert_many from
+    # a background thread, either when a collection has `batch_size` documents
+    # waiting or every `flush_interval` seconds. At most `max_pending`
+    # documents are held; beyond that `put` blocks until the next flush
+    # (policy "block") or discards the document (policy "drop"). `on_write`,
+    # if given, is called with (name, documents) after each successful insert.
+    # Documents whose insert fails go back to the front of their queue, as far
+    # as max_pending allows, and are retried after `retry_backoff` seconds,
+    # doubling per failure; after `max_retries` failed flushes they are dropped
+    # and counted as failed.
+    def __init__(self, collections, batch_size=100, flush_interval=1.0, max_pending=10000, policy="block",
+                 on_write=None, max_retries=5, retry_backoff=1.0):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown write buffer policy: {policy}")
+        self.collections = collections
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.policy = policy
+        self.on_write = on_write
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.pending = {name: [] for name in collections}
+        self.attempts = {name: 0 for name in collections}
+        self.retry_at = {name: 0.0 for name in collections}
+        self.pending_count = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retried = 0
+        self.flushes = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_error = ""
+        self.closed = False
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def put(self, name, document, timeout=None):
+        with self.condition:
+            if self.closed:
+                raise BufferFull("Write buffer is closed")
+            while self.pending_count >= self.max_pending:
+                if self.policy == "drop":
+                    self.dropped += 1
+                    return False
+                self.condition.notify_all()
+                if not self.condition.wait(timeout) and timeout is not None:
+                    raise BufferFull(f"Timed out waiting for room in the {name} write buffer")
+            self.pending[name].append(document)
+            self.pending_count += 1
+            if len(self.pending[name]) >= self.batch_size:
+                self.condition.notify_all()
+            return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.closed and not self._batch_ready():
+                    self.condition.wait(self.flush_interval)
+                closed = self.closed
+            self.flush()
+            if closed:
+                return
+
+    def _ready(self, name, now):
+        # Collections backing off after a failed insert wait for their retry time
+        return self.closed or now >= self.retry_at[name]
+
+    def _batch_ready(self):
+        now = time.time()
+        ready = [documents for name, documents in self.pending.items() if documents and self._ready(name, now)]
+        return bool(ready) and (
+            self.pending_count >= self.max_pending or any(len(documents) >= self.batch_size for documents in ready)
+        )
+
+    def _insert(self, name, documents):
+        # Returns (written, to retry). With ordered=False the documents that are
+        # not listed in writeErrors were written; a duplicate key means an
+        # earlier attempt already wrote the document.
+        try:
+            self.collections[name].insert_many(documents, ordered=False)
+            return documents, []
+        except Exception as e:
+            self.last_error = f"{name}: {e}"
+            details = getattr(e, "details", None)
+            if not isinstance(details, dict) or "writeErrors" not in details or details.get("writeConcernErrors"):
+                return [], documents
+            failed = {error["index"] for error in details["writeErrors"] if error.get("code") != 11000}
+            return ([document for i, document in enumerate(documents) if i not in failed],
+                    [documents[i] for i in sorted(failed)])
+
+    def _requeue(self, name, documents):
+        with self.condition:
+            self.attempts[name] += 1
+            if self.closed or self.attempts[name] > self.max_retries:
+                self.failed += len(documents)
+                self.attempts[name] = 0
+                self.retry_at[name] = 0.0
+                return
+            room = max(0, self.max_pending - self.pending_count)
+            retry = documents[:room]
+            self.failed += len(documents) - len(retry)
+            self.retried += len(retry)
+            self.pending[name][:0] = retry
+            self.pending_count += len(retry)
+            self.retry_at[name] = time.time() + self.retry_backoff * 2 ** (self.attempts[name] - 1)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.condition:
+                now = time.time()
+                batches = {}
+                for name, documents in self.pending.items():
+                    if documents and self._ready(name, now):
+                        batches[name] = documents
+                        self.pending[name] = []
+                        self.pending_count -= len(documents)
+                self.condition.notify_all()
+            for name, documents in batches.items():
+                started = time.time()
+                written, retry = self._insert(name, documents)
+                self.written += len(written)
+                if retry:
+                    self._requeue(name, retry)
+                else:
+                    self.attempts[name] = 0
+                    self.retry_at[name] = 0.0
+                if written and self.on_write:
+                    try:
+                        self.on_write(name, written)
+                    except Exception as e:
+                        self.last_error = f"{name} on_write: {e}"
+                elapsed = time.time() - started
+                self.flushes += 1
+                self.flush_seconds_total += elapsed
+                self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "queue_depth": {name: len(documents) for name, documents in self.pending.items()},
+                "pending": self.pending_count,
+                "max_pending": self.max_pending,
+                "policy": self.policy,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "retried": self.retried,
+                "retrying": {name: attempts for name, attempts in self.attempts.items() if attempts},
+                "flushes": self.flushes,
+                "flush_avg_sec": round(self.flush_seconds_total / self.flushes, 4) if self.flushes else 0,
+                "flush_max_sec": round(self.flush_seconds_max, 4),
+                "last_error": self.last_error,
+            }
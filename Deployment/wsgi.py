@@ -0,0 +1,32 @@
+# Production entry point for multi-process serving:
+#
+#   cd Deployment
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# With STORY_OFFLINE=1 every worker uses mongomock and the replaying fake Gemini
+# model instead of MongoDB and Gemini, for load tests against a real server
+# (python -m benchmarks.harness --url http://127.0.0.1:5000).
+import os
+
+from app import create_app
+
+if os.environ.get("STORY_OFFLINE"):
+    import mongomock
+
+    from fake_gemini import ReplayGenerativeModel, load_recorded
+
+    corpus = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "data", "recorded_outputs.jsonl")
+    app = create_app(
+        generative_model=ReplayGenerativeModel(
+            load_recorded(corpus),
+            latency=os.environ.get("STORY_OFFLINE_LATENCY", "lognormal:-1,0.5"),
+            pass_rate=float(os.environ.get("STORY_OFFLINE_PASS_RATE", "0.7"))
+        ),
+        mongo_client=mongomock.MongoClient()
+    )
+else:
+    # Loaded in the gunicorn master (preload_app) so forked workers share it;
+    # importing the SDK does no network I/O
+    import google.generativeai  # noqa: F401
+
+    app = create_app()
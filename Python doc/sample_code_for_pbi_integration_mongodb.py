@@ -1,12 +1,12 @@
-from pymongo import MongoClient
-import pandas as pd
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["storygen_db"]
-# Example: Load feedback collection
-collection = db["feedback_collection"]
-data = list(collection.find())
-df = pd.DataFrame(data)
-# Clean up and export to CSV
-df.drop(columns=["_id"], inplace=True, errors="ignore")
-df.to_csv("feedback_data.csv", index=False)
+# The dashboard export is incremental now: each run appends only the feedback
+# stored since the last run (without story texts) and refreshes the small daily
+# rollup tables. Point Power BI at the output folder. See Deployment/pbi_export.py.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Deployment"))
+
+from pbi_export import main
+
+if __name__ == "__main__":
+    main()